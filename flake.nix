@@ -78,6 +78,7 @@
             velocity-server
             minecraft-server
             nix-modrinth-prefetch
+            packwiz-prefetch
             ;
 
           docsAsciiDoc = docs.optionsAsciiDoc;
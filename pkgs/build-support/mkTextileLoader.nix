@@ -16,7 +16,28 @@
 
 let
   lib_lock = lib.importJSON ./libraries.json;
-  fetchedLibraries = lib.forEach libraries (l: "${fetchurl lib_lock.${l}}");
+
+  # Only the repository and hash of each library are locked, the rest of its
+  # URL follows from its Maven coordinate
+  fetchLibrary =
+    name:
+    let
+      library = lib_lock.libraries.${name};
+      coordinate = lib.splitString ":" name;
+      group = lib.elemAt coordinate 0;
+      artifact = lib.elemAt coordinate 1;
+      version = lib.elemAt coordinate 2;
+      jar = "${artifact}-${version}.jar";
+    in
+    fetchurl {
+      name = library.name or jar;
+      url = lib.concatStrings [
+        lib_lock.repositories.${library.repo}
+        "${lib.replaceStrings [ "." ] [ "/" ] group}/${artifact}/${version}/${jar}"
+      ];
+      inherit (library) sha256;
+    };
+  fetchedLibraries = lib.forEach libraries (l: "${fetchLibrary l}");
 
   classPath = lib.concatStringsSep " " fetchedLibraries;
   manifest = writeText "manifest.mf" (
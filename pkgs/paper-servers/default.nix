@@ -10,17 +10,20 @@ let
   inherit (lib.our) escapeVersion;
   inherit (lib)
     nameValuePair
-    flatten
-    last
+    concatLists
+    genAttrs
     versionOlder
+    mapAttrs
     mapAttrsToList
+    importJSON
     ;
-  versions = lib.importJSON ./lock.json;
 
-  # Remove -build... suffix
-  stripBuild = v: builtins.head (builtins.match "(.*)-build.*" v);
-  # Sort by attribute 'attr' using 'f' function
-  sortBy = attr: f: builtins.sort (a: b: f a.${attr} b.${attr});
+  endpoint = "https://api.papermc.io/v2/projects/paper";
+
+  # Every version's build numbers and latest build, precomputed by update.py.
+  # The per-build data in each version's lock is only read when needed.
+  index = importJSON ./locks/index.json;
+  locks = mapAttrs (mcVersion: _: importJSON (./locks + "/${mcVersion}.json")) index.versions;
 
   # https://docs.papermc.io/paper/getting-started#requirements
   getRecommendedJavaVersion =
@@ -32,28 +35,37 @@ let
     else
       jdk;
 
-  packages = mapAttrsToList (
-    mcVersion: builds:
-    sortBy "version" versionOlder (
-      mapAttrsToList (
-        buildNumber: value:
-        callPackage ./derivation.nix {
-          inherit (value) url sha256;
-          version = "${mcVersion}-build.${buildNumber}";
-          jre = getRecommendedJavaVersion mcVersion;
-          minecraft-server = vanillaServers."vanilla-${escapeVersion mcVersion}";
-        }
-      ) builds
-    )
-  ) versions;
+  mkPackage =
+    mcVersion: buildNumber:
+    let
+      build = locks.${mcVersion}.${buildNumber};
+      name = build.name or "paper-${mcVersion}-${buildNumber}.jar";
+    in
+    callPackage ./derivation.nix {
+      url = "${endpoint}/versions/${mcVersion}/builds/${buildNumber}/downloads/${name}";
+      inherit (build) sha256;
+      version = "${mcVersion}-build.${buildNumber}";
+      jre = getRecommendedJavaVersion mcVersion;
+      minecraft-server = vanillaServers."vanilla-${escapeVersion mcVersion}";
+    };
 
-  # Latest build for each MC version
-  latestBuilds = sortBy "version" versionOlder (map last packages);
+  packages = mapAttrs (mcVersion: v: genAttrs v.builds (mkPackage mcVersion)) index.versions;
 in
 lib.recurseIntoAttrs (
   builtins.listToAttrs (
-    (map (x: nameValuePair (escapeVersion x.name) x) (flatten packages))
-    ++ (map (x: nameValuePair (escapeVersion (stripBuild x.name)) x) latestBuilds)
-    ++ [ (nameValuePair "paper" (last latestBuilds)) ]
+    concatLists (
+      mapAttrsToList (
+        mcVersion: builds:
+        mapAttrsToList (
+          buildNumber: nameValuePair (escapeVersion "paper-${mcVersion}-build.${buildNumber}")
+        ) builds
+      ) packages
+    )
+    # Latest build for each MC version
+    ++ mapAttrsToList (
+      mcVersion: v:
+      nameValuePair (escapeVersion "paper-${mcVersion}") packages.${mcVersion}.${v.latest}
+    ) index.versions
+    ++ [ (nameValuePair "paper" packages.${index.latest.version}.${index.latest.build}) ]
   )
 )
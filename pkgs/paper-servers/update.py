@@ -1,71 +1,30 @@
 #!/usr/bin/env nix-shell
 #!nix-shell -i python3 -p python3Packages.requests
 
-import json
-import requests
+import sys
 from pathlib import Path
-from requests.adapters import HTTPAdapter, Retry
 
-ENDPOINT = "https://api.papermc.io/v2/projects/paper"
-
-TIMEOUT = 5
-RETRIES = 5
-
-class TimeoutHTTPAdapter(HTTPAdapter):
-    def __init__(self, *args, **kwargs):
-        self.timeout = TIMEOUT
-        if "timeout" in kwargs:
-            self.timeout = kwargs["timeout"]
-            del kwargs["timeout"]
-        super().__init__(*args, **kwargs)
-
-    def send(self, request, **kwargs):
-        timeout = kwargs.get("timeout")
-        if timeout is None:
-            kwargs["timeout"] = self.timeout
-        return super().send(request, **kwargs)
-
-
-def make_client():
-    http = requests.Session()
-    retries = Retry(total=RETRIES, backoff_factor=1, status_forcelist=[429, 500, 502, 503, 504])
-    http.mount('https://', TimeoutHTTPAdapter(max_retries=retries))
-    return http
-
-
-def get_game_versions(client):
-    print("Fetching game versions")
-    data = client.get(ENDPOINT).json()
-    return data["versions"]
-
-
-def get_builds(version, client):
-    print(f"Fetching builds for {version}")
-    data = client.get(f"{ENDPOINT}/versions/{version}/builds").json()
-    return data["builds"]
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from updater import papermc
 
+NAME = "paper"
+ENDPOINT = "https://api.papermc.io/v2/projects/paper"
 
-def main(lock, client):
-    output = {}
-    print("Starting fetch")
+# Paper builds are all locked regardless of channel
+LOCK_CHANNEL = False
 
-    for version in get_game_versions(client):
-        output[version] = {}
-        for build in get_builds(version, client):
-            build_number = build["build"]
-            build_sha256 = build["downloads"]["application"]["sha256"]
-            build_filename = build["downloads"]["application"]["name"]
-            build_url = f"{ENDPOINT}/versions/{version}/builds/{build_number}/downloads/{build_filename}"
-            output[version][build_number] = {
-                "url": build_url,
-                "sha256": build_sha256,
-            }
+# Any build can be the default `paper` package
+LATEST_BUILD_FILTER = lambda build: True
 
-    json.dump(output, lock, indent=2)
-    lock.write("\n")
+# Retention policy of the lock, where a build is kept if it is one of the
+# newest RETAIN_LATEST builds of its version, was published on or after the
+# date RETAIN_SINCE (e.g. "2024-01-01"), or is listed in RETAIN_BUILDS, a dict
+# of versions to build numbers. Leaving all three unset keeps every build.
+# A changed policy only applies to older versions after an update with --full.
+RETAIN_LATEST = None
+RETAIN_SINCE = None
+RETAIN_BUILDS = {}
 
 
 if __name__ == "__main__":
-    folder = Path(__file__).parent
-    lock_path = folder / "lock.json"
-    main(open(lock_path, "w"), make_client())
+    papermc.run(sys.modules[__name__])
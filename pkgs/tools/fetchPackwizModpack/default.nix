@@ -25,6 +25,10 @@ let
       # 'manifest' without IFD, you can alternatively pass a manifestHash, that
       # allows us to fetch it with builtins.fetchurl instead.
       manifestHash ? null,
+      # A lock of every file in the pack, written by `packwiz-prefetch --lock`.
+      # The pack is then assembled from the locked files, without running
+      # packwiz-installer or needing a packHash.
+      lock ? null,
       ...
     }@args:
     let
@@ -35,6 +39,35 @@ let
       version = args.version or (if !srcNull then toml.version else "");
       drv = fetchPackwizModpack args;
       bootstrapUrl = if !urlNull then url else "file://${src}/pack.toml";
+
+      fetchLockedFile =
+        file:
+        if file ? url then fetchurl { inherit (file) name url hash; } else src + "/${file.path}";
+
+      # Attributes only used to run packwiz-installer
+      installerAttrs = [
+        "packwizInstaller"
+        "packwizInstallerBootstrap"
+        "buildInputs"
+        "buildPhase"
+        "outputHashMode"
+        "outputHashAlgo"
+        "outputHash"
+      ];
+
+      lockedAttrs = {
+        installPhase = ''
+          runHook preInstall
+
+          ${lib.concatLines (
+            lib.mapAttrsToList (path: file: ''
+              install -Dm644 ${lib.escapeShellArg "${fetchLockedFile file}"} \
+                "$out"/${lib.escapeShellArg path}
+            '') (lib.importJSON lock).files
+          )}
+          runHook postInstall
+        '';
+      };
     in
 
     assert lib.assertMsg (
@@ -43,7 +76,7 @@ let
 
     stdenvNoCC.mkDerivation (
       finalAttrs:
-      {
+      removeAttrs {
         inherit pname version;
 
         packwizInstaller = fetchurl rec {
@@ -146,8 +179,9 @@ let
         outputHashMode = "recursive";
         outputHashAlgo = "sha256";
         outputHash = packHash;
-      }
-      // args
+      } (lib.optionals (lock != null) installerAttrs)
+      // lib.optionalAttrs (lock != null) lockedAttrs
+      // removeAttrs args [ "lock" ]
     );
 in
 fetchPackwizModpack
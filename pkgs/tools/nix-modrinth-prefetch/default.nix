@@ -0,0 +1,11 @@
+{
+  writers,
+  python3Packages,
+}:
+writers.writePython3Bin "nix-modrinth-prefetch" {
+  libraries = [ python3Packages.requests ];
+  flakeIgnore = [
+    "E501"
+    "W503"
+  ];
+} (builtins.readFile ./nix-modrinth-prefetch.py)
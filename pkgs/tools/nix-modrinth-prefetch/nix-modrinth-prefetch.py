@@ -0,0 +1,191 @@
+"""
+Resolves Modrinth versions to the `fetchurl` invocations of their files.
+
+Version IDs are resolved in bulk through the `versions` endpoint. A single
+version prints a single `fetchurl` invocation, and several print an attrset of
+them keyed by file name, or a JSON lock with --json. With --latest, the
+arguments are projects instead, resolved to their latest version for the given
+game version and loader.
+"""
+
+import argparse
+import json
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter, Retry
+
+API = "https://api.modrinth.com/v2"
+USER_AGENT = "github.com/Infinidoge/nix-minecraft (nix-modrinth-prefetch)"
+TIMEOUT = 30
+
+# Version IDs per request to the bulk endpoint, which keeps URLs short enough
+CHUNK_SIZE = 100
+
+# Maximum number of projects to look up at once with --latest
+JOBS = 8
+
+
+class PrefetchError(Exception):
+    pass
+
+
+def make_client():
+    client = requests.Session()
+    client.headers["User-Agent"] = USER_AGENT
+    retries = Retry(
+        total=5, backoff_factor=1, status_forcelist=[429, 500, 502, 503, 504]
+    )
+    client.mount("https://", HTTPAdapter(max_retries=retries, pool_maxsize=JOBS))
+    return client
+
+
+def get(client, path, **params):
+    params = {key: json.dumps(value) for key, value in params.items()}
+    response = client.get(f"{API}/{path}", params=params, timeout=TIMEOUT)
+    response.raise_for_status()
+    return response.json()
+
+
+def get_versions(client, ids):
+    """
+    Returns the versions with each of `ids` in order, in chunks of CHUNK_SIZE
+    """
+    found = {}
+    for i in range(0, len(ids), CHUNK_SIZE):
+        for version in get(client, "versions", ids=ids[i:i + CHUNK_SIZE]):
+            found[version["id"]] = version
+
+    missing = [id for id in ids if id not in found]
+    if missing:
+        raise PrefetchError(f"invalid versions: {', '.join(missing)}")
+    return [found[id] for id in ids]
+
+
+def get_latest_versions(client, projects, game_version, loader):
+    """
+    Returns the latest version of each of `projects` that supports the game
+    version and loader, if given
+    """
+    filters = {}
+    if game_version is not None:
+        filters["game_versions"] = [game_version]
+    if loader is not None:
+        filters["loaders"] = [loader]
+
+    def latest(project):
+        # Versions are listed newest first
+        versions = get(client, f"project/{project}/version", **filters)
+        if not versions:
+            raise PrefetchError(f"no matching versions of {project}")
+        return versions[0]
+
+    with ThreadPoolExecutor(max_workers=JOBS) as executor:
+        return list(executor.map(latest, projects))
+
+
+def lock_version(version):
+    """
+    Returns the file name, URL and sha512 of a version's primary file
+    """
+    files = version["files"]
+    file = next((file for file in files if file["primary"]), files[0])
+    return file["filename"], {"url": file["url"], "sha512": file["hashes"]["sha512"]}
+
+
+def lock_versions(versions):
+    """
+    Returns the locks of the primary files of `versions` by file name, which
+    must be unique across them
+    """
+    locks = {}
+    for version in versions:
+        name, lock = lock_version(version)
+        if locks.get(name, lock) != lock:
+            raise PrefetchError(f"several files are named {name}")
+        locks[name] = lock
+    return locks
+
+
+def nix_string(string):
+    return json.dumps(string, ensure_ascii=False).replace("${", "\\${")
+
+
+def fetchurl(lock):
+    url, sha512 = nix_string(lock["url"]), nix_string(lock["sha512"])
+    return f"fetchurl {{ url = {url}; sha512 = {sha512}; }}"
+
+
+def read_ids(path):
+    """
+    Reads IDs from a file with one per line, ignoring blank lines and comments
+    """
+    with open(path) as file:
+        lines = (line.split("#", 1)[0].strip() for line in file)
+        return [line for line in lines if line]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "ids",
+        nargs="*",
+        metavar="ID",
+        help="version IDs to resolve, or project IDs or slugs with --latest",
+    )
+    parser.add_argument(
+        "-f",
+        "--file",
+        action="append",
+        default=[],
+        help="read IDs from FILE, one per line",
+    )
+    parser.add_argument(
+        "--json",
+        action="store_true",
+        help="print a JSON lock of {url, sha512} by file name",
+    )
+    parser.add_argument(
+        "--latest",
+        action="store_true",
+        help="resolve projects to their latest version",
+    )
+    parser.add_argument(
+        "--game-version",
+        help="only consider versions for this game version with --latest",
+    )
+    parser.add_argument(
+        "--loader",
+        help="only consider versions for this loader with --latest",
+    )
+    args = parser.parse_args()
+
+    ids = list(args.ids)
+    for path in args.file:
+        ids += read_ids(path)
+    if not ids:
+        parser.error("no IDs given")
+
+    client = make_client()
+    try:
+        ids = list(dict.fromkeys(ids))
+        if args.latest:
+            versions = get_latest_versions(
+                client, ids, args.game_version, args.loader
+            )
+        else:
+            versions = get_versions(client, ids)
+        locks = lock_versions(versions)
+    except (PrefetchError, requests.RequestException) as e:
+        sys.exit(f"error: {e}")
+
+    if args.json:
+        print(json.dumps(locks, indent=2))
+    elif len(locks) == 1:
+        print(fetchurl(*locks.values()))
+    else:
+        print("{")
+        for name, lock in locks.items():
+            print(f"  {nix_string(name)} = {fetchurl(lock)};")
+        print("}")
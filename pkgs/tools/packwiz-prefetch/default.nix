@@ -0,0 +1,11 @@
+{
+  writers,
+  python3Packages,
+}:
+writers.writePython3Bin "packwiz-prefetch" {
+  libraries = [ python3Packages.requests ];
+  flakeIgnore = [
+    "E501"
+    "W503"
+  ];
+} (builtins.readFile ./packwiz-prefetch.py)
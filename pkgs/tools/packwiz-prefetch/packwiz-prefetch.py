@@ -0,0 +1,255 @@
+"""
+Resolves a packwiz modpack without packwiz-installer, downloading and verifying
+every file concurrently. Optionally writes a lock of every file in the pack,
+which `fetchPackwizModpack` can build from without a JVM or a packHash.
+
+Metafiles using `mode = "metadata:curseforge"`, which have no download URL, are
+downloaded from CurseForge's CDN by their file ID and name. Their hash is
+checked like any other, so files that the CDN doesn't serve fail to resolve.
+"""
+
+import argparse
+import base64
+import hashlib
+import json
+import os
+import re
+import sys
+import tomllib
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import quote, unquote, urljoin, urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter, Retry
+
+TIMEOUT = 30
+CHUNK_SIZE = 64 * 1024
+
+# Maximum number of files to download at once
+JOBS = 16
+
+# Hash formats that fetchurl can check directly, in Nix's names for them.
+# Files using any other format are locked by their sha256 after verifying them.
+SRI_FORMATS = {"sha1": "sha1", "sha256": "sha256", "sha512": "sha512"}
+
+# Where CurseForge serves a file, from its ID split into the thousands and the
+# rest, and its name
+CURSEFORGE_CDN = "https://edge.forgecdn.net/files/{}/{}/{}"
+
+# Characters Nix allows in store path names
+STORE_NAME = re.compile(r"[^A-Za-z0-9+\-._?=]")
+
+
+class PackError(Exception):
+    pass
+
+
+def make_client(jobs):
+    client = requests.Session()
+    retries = Retry(
+        total=5, backoff_factor=1, status_forcelist=[429, 500, 502, 503, 504]
+    )
+    adapter = HTTPAdapter(max_retries=retries, pool_maxsize=jobs)
+    client.mount("https://", adapter)
+    client.mount("http://", adapter)
+    return client
+
+
+def is_url(location):
+    return urlsplit(location).scheme in ("http", "https")
+
+
+def resolve(base, path):
+    """
+    Returns the location of `path` relative to the file at `base`
+    """
+    if is_url(base):
+        return urljoin(base, path)
+    return os.path.join(os.path.dirname(base), path)
+
+
+def open_hashes(formats):
+    hashes = {}
+    for format in formats:
+        try:
+            hashes[format] = hashlib.new(format)
+        except ValueError:
+            raise PackError(f"unsupported hash format {format}")
+    return hashes
+
+
+def read(client, location, format, expected, keep=True):
+    """
+    Reads the file at a URL or path, checking that its hash in `format` is
+    `expected`. Returns its contents, unless `keep` is unset, and its sha256
+    digest.
+    """
+    hashes = open_hashes({format, "sha256"})
+    chunks = []
+
+    def update(chunk):
+        if keep:
+            chunks.append(chunk)
+        for h in hashes.values():
+            h.update(chunk)
+
+    if is_url(location):
+        with client.get(location, stream=True, timeout=TIMEOUT) as response:
+            response.raise_for_status()
+            for chunk in response.iter_content(CHUNK_SIZE):
+                update(chunk)
+    else:
+        with open(location, "rb") as file:
+            while chunk := file.read(CHUNK_SIZE):
+                update(chunk)
+
+    if expected is not None and hashes[format].hexdigest() != expected.lower():
+        raise PackError(
+            f"{location}: expected {format} {expected},"
+            f" got {hashes[format].hexdigest()}"
+        )
+    return b"".join(chunks), hashes["sha256"].digest()
+
+
+def sri(format, expected, sha256):
+    """
+    Returns the SRI hash to lock a verified file with, reusing the pack's own
+    hash when fetchurl supports its format
+    """
+    if format in SRI_FORMATS:
+        digest = bytes.fromhex(expected)
+        return f"{SRI_FORMATS[format]}-{base64.b64encode(digest).decode()}"
+    return f"sha256-{base64.b64encode(sha256).decode()}"
+
+
+def store_name(location):
+    return STORE_NAME.sub("_", unquote(os.path.basename(urlsplit(location).path)))
+
+
+def lock_file(root, location, hash):
+    """
+    Returns the lock entry of a file in the pack, which is either fetched from
+    its URL or taken from the pack's source directory at `root`
+    """
+    if is_url(location):
+        url = requests.utils.requote_uri(location)
+        return {"name": store_name(url), "url": url, "hash": hash}
+    return {"path": os.path.relpath(location, root), "hash": hash}
+
+
+def download_url(path, meta):
+    """
+    Returns the URL to download the file a metafile describes from
+    """
+    download = meta["download"]
+    if "url" in download:
+        return download["url"]
+    if download.get("mode") == "metadata:curseforge":
+        file_id = meta["update"]["curseforge"]["file-id"]
+        return CURSEFORGE_CDN.format(
+            file_id // 1000, file_id % 1000, quote(meta["filename"])
+        )
+    raise PackError(f"{path}: download mode {download.get('mode')} is not supported")
+
+
+def resolve_file(client, root, index_location, entry, default_format, side):
+    """
+    Downloads and verifies a file listed in the index, resolving metafiles to
+    the file they describe. Returns its path in the pack and its lock entry, or
+    None if it isn't installed on `side`.
+    """
+    path = entry["file"]
+    location = resolve(index_location, path)
+    format = entry.get("hash-format", default_format)
+    metafile = entry.get("metafile", False)
+    data, sha256 = read(client, location, format, entry["hash"], keep=metafile)
+
+    if not metafile:
+        hash = sri(format, entry["hash"], sha256)
+        return entry.get("alias", path), lock_file(root, location, hash)
+
+    meta = tomllib.loads(data.decode())
+    if side != "both" and meta.get("side", "both") not in ("both", side):
+        return None
+    url = download_url(path, meta)
+    download = meta["download"]
+    format = download["hash-format"]
+    _, sha256 = read(client, url, format, download["hash"], keep=False)
+    hash = sri(format, download["hash"], sha256)
+    target = os.path.join(os.path.dirname(entry.get("alias", path)), meta["filename"])
+    return target, lock_file(root, url, hash)
+
+
+def prefetch(location, side="server", jobs=JOBS):
+    """
+    Resolves the pack whose pack.toml is at a URL or path, returning the lock
+    of every file it installs on `side`, in index order
+    """
+    client = make_client(jobs)
+    root = None if is_url(location) else os.path.dirname(location)
+    data, sha256 = read(client, location, "sha256", None)
+    pack = tomllib.loads(data.decode())
+
+    index_location = resolve(location, pack["index"]["file"])
+    index_format = pack["index"]["hash-format"]
+    index, _ = read(client, index_location, index_format, pack["index"]["hash"])
+    index = tomllib.loads(index.decode())
+
+    def resolve_entry(entry):
+        print(f"Resolving {entry['file']}", file=sys.stderr)
+        try:
+            return resolve_file(
+                client, root, index_location, entry, index["hash-format"], side
+            )
+        except (PackError, requests.RequestException) as e:
+            return e
+
+    files = {"pack.toml": lock_file(root, location, sri("sha256", sha256.hex(), sha256))}
+    errors = []
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        for result in executor.map(resolve_entry, index.get("files", [])):
+            if isinstance(result, Exception):
+                errors.append(result)
+            elif result is not None:
+                path, lock = result
+                files[path] = lock
+
+    for error in errors:
+        print(f"error: {error}", file=sys.stderr)
+    if errors:
+        raise PackError(f"failed to resolve {len(errors)} files")
+    return files
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("pack", help="URL or path of the pack's pack.toml")
+    parser.add_argument(
+        "--side",
+        choices=["server", "client", "both"],
+        default="server",
+        help="side to resolve the pack for (default: server)",
+    )
+    parser.add_argument(
+        "--lock",
+        metavar="FILE",
+        help="write the lock of every file in the pack to FILE",
+    )
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=JOBS,
+        help="maximum number of files to download at once",
+    )
+    args = parser.parse_args()
+
+    try:
+        files = prefetch(args.pack, args.side, args.jobs)
+    except (PackError, requests.RequestException, OSError) as e:
+        sys.exit(f"error: {e}")
+
+    print(f"Resolved {len(files)} files", file=sys.stderr)
+    if args.lock:
+        with open(args.lock, "w") as file:
+            json.dump({"side": args.side, "files": files}, file, indent=2)
+            file.write("\n")
@@ -0,0 +1,199 @@
+#!/usr/bin/env nix-shell
+#!nix-shell -i python3 -p python3Packages.requests python3Packages.jq
+
+"""
+Runs the update scripts of every server ecosystem in parallel, then prints a
+summary of what each one added and how long it took. Libraries that no
+textile ecosystem references anymore are then removed from libraries.json.
+"""
+
+import argparse
+import logging
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+from updater import load_plugin, papermc, textile, vanilla
+from updater.client import RequestLimiter, make_client
+from updater.fetch import cancelled
+from updater.libraries import collect_garbage, read_libraries, write_libraries
+from updater.locks import interrupt_on_sigterm
+from updater.metrics import add_arguments, instrument
+
+logger = logging.getLogger("update-all")
+
+# Each ecosystem's folder in pkgs/, and the module that updates it.
+# Textile ecosystems are listed in the order their new libraries are merged
+# into libraries.json.
+ECOSYSTEMS = {
+    "vanilla": ("vanilla-servers", vanilla),
+    "fabric": ("fabric-servers", textile),
+    "quilt": ("quilt-servers", textile),
+    "legacy-fabric": ("legacy-fabric-servers", textile),
+    "paper": ("paper-servers", papermc),
+    "velocity": ("velocity-servers", papermc),
+}
+
+# Requests in flight across all ecosystems, and to any single host at most,
+# which is adapted to how each host responds
+TOTAL_JOBS = 32
+HOST_JOBS = 8
+
+
+def update(name, limiter, libraries, save_libraries, resume):
+    """
+    Run the updater of one ecosystem, returning its summary and duration
+    """
+    folder, engine = ECOSYSTEMS[name]
+    plugin = load_plugin(name, folder)
+    client = make_client(HOST_JOBS, limiter)
+
+    start = time.monotonic()
+    if engine is textile:
+        summary = engine.update(plugin, client, libraries, save_libraries)
+    elif engine is papermc:
+        summary = engine.update(plugin, client, resume=resume)
+    else:
+        summary = engine.update(plugin, client)
+    return summary, time.monotonic() - start
+
+
+def gc_libraries():
+    """
+    Remove unreferenced libraries from libraries.json, returning whether every
+    library referenced by a version lock is locked
+    """
+    locks = [
+        Path(__file__).parent / folder / lock
+        for folder, engine in ECOSYSTEMS.values()
+        if engine is textile
+        for lock in ("loader_locks.json", "game_locks.json")
+    ]
+    libraries = read_libraries()
+    orphans, dangling = collect_garbage(libraries, locks)
+    if orphans:
+        write_libraries(libraries)
+
+    print(f"\nRemoved {len(orphans)} unreferenced libraries")
+    for name, refs in dangling.items():
+        for path, version in refs:
+            logger.error(f"{path.parent.name} {version} references missing {name}")
+    return not dangling
+
+
+def main(names, total_jobs, host_jobs, resume=False, gc=True):
+    limiter = RequestLimiter(total_jobs, host_jobs)
+
+    # Textile ecosystems share libraries.json, so each works on its own copy
+    # of it, which are merged whenever libraries need to be saved. Libraries
+    # that several of them need are still only prefetched once, as
+    # prefetches are shared across the process.
+    libraries = read_libraries()
+    copies = {name: dict(libraries) for name in names if ECOSYSTEMS[name][1] is textile}
+    libraries_lock = threading.Lock()
+
+    def save_libraries():
+        # Rebuilt from the original lock in a fixed order every time, so the
+        # order of entries doesn't depend on how far each ecosystem got
+        with libraries_lock:
+            merged = dict(libraries)
+            for copy in copies.values():
+                for library, entry in list(copy.items()):
+                    if libraries.get(library) != entry:
+                        merged[library] = entry
+            write_libraries(merged)
+
+    results = {}
+    with ThreadPoolExecutor(max_workers=len(names)) as executor:
+        futures = {
+            name: executor.submit(
+                update, name, limiter, copies.get(name), save_libraries, resume
+            )
+            for name in names
+        }
+
+        try:
+            wait(futures.values())
+        except KeyboardInterrupt:
+            logger.warning("Cancelled, waiting for updates to write their progress")
+            cancelled.set()
+
+        for name, future in futures.items():
+            try:
+                results[name] = future.result()
+            except BaseException:
+                logger.exception(f"Updating {name} failed")
+                results[name] = None
+
+    print("\nSummary:")
+    for name in names:
+        if results[name] is None:
+            print(f"  {name}: failed")
+            continue
+        summary, duration = results[name]
+        added = ", ".join(f"{count} {item}" for item, count in summary.items())
+        print(f"  {name}: added {added} in {duration:.1f}s")
+
+    # Interrupted updates may have locked libraries that their versions don't
+    # reference yet, so only collect garbage after a complete update. The
+    # textile and vanilla updaters return normally when cancelled, with what
+    # they locked so far.
+    if cancelled.is_set():
+        logger.warning("Cancelled, not removing unreferenced libraries")
+        return False
+    success = all(result is not None for result in results.values())
+    if gc and success:
+        success = gc_libraries()
+    return success
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "ecosystems",
+        nargs="*",
+        metavar="ECOSYSTEM",
+        help=f"ecosystems to update (default: all of {', '.join(ECOSYSTEMS)})",
+    )
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=TOTAL_JOBS,
+        help="maximum number of requests in flight across all ecosystems",
+    )
+    parser.add_argument(
+        "--host-jobs",
+        type=int,
+        default=HOST_JOBS,
+        help="maximum number of requests in flight to a single host, which"
+        " adapts to how the host responds",
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="continue interrupted Paper and Velocity updates",
+    )
+    parser.add_argument(
+        "--no-gc",
+        dest="gc",
+        action="store_false",
+        help="keep libraries that no version references anymore",
+    )
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    for name in args.ecosystems:
+        if name not in ECOSYSTEMS:
+            parser.error(f"unknown ecosystem: {name}")
+
+    # Keep the order of ECOSYSTEMS, which libraries are merged in
+    names = [
+        name for name in ECOSYSTEMS if not args.ecosystems or name in args.ecosystems
+    ]
+    interrupt_on_sigterm()
+    with instrument(args):
+        success = main(names, args.jobs, args.host_jobs, args.resume, args.gc)
+    sys.exit(0 if success else 1)
@@ -0,0 +1,20 @@
+"""
+Shared code for the `update.py` scripts in `pkgs/`.
+
+The scripts add `pkgs/` to `sys.path` and import from this package, so it must
+only depend on the packages they already pull in through their nix-shell lines.
+"""
+
+import importlib.util
+from pathlib import Path
+
+
+def load_plugin(name, folder):
+    """
+    Import the `update.py` plugin module of the package in `pkgs/<folder>`
+    """
+    path = Path(__file__).parent.parent / folder / "update.py"
+    spec = importlib.util.spec_from_file_location(f"{name}_update", path)
+    plugin = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(plugin)
+    return plugin
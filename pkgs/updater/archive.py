@@ -0,0 +1,172 @@
+"""
+Recording and replaying of HTTP responses, so that updates can be rerun on
+identical inputs without the network.
+
+An archive is a directory holding `index.json`, which maps the method and URL
+of each request to its response's status, headers and body, and `bodies.pack`,
+which holds each distinct body once, compressed unless that doesn't make it
+smaller. Setting NIX_MINECRAFT_RECORD to an archive's path makes the clients
+from `make_client` record every response they return into it, and setting
+NIX_MINECRAFT_REPLAY makes them answer from it instead of the network.
+"""
+
+import atexit
+import hashlib
+import mmap
+import os
+import threading
+import zlib
+from pathlib import Path
+
+import requests
+from requests.adapters import BaseAdapter
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+
+from .locks import read_lock, write_lock
+
+RECORD = os.environ.get("NIX_MINECRAFT_RECORD")
+REPLAY = os.environ.get("NIX_MINECRAFT_REPLAY")
+
+COMPRESSION_LEVEL = 6
+
+# Headers describing how the body was transferred, which no longer apply to
+# the decoded body that is archived
+TRANSFER_HEADERS = {"content-encoding", "transfer-encoding"}
+
+
+def request_key(request):
+    return f"{request.method} {request.url}"
+
+
+class Archive:
+    def __init__(self, path):
+        self.path = Path(path)
+        self.index_path = self.path / "index.json"
+        self.pack_path = self.path / "bodies.pack"
+        self.index = read_lock(self.index_path)
+        # Where each distinct body is in the pack, by its sha256
+        self.bodies = {
+            entry["sha256"]: entry["body"] for entry in self.index.values()
+        }
+        self.lock = threading.Lock()
+        self.pack = None
+
+    def record(self, request, response):
+        """
+        Add a response to the archive, reading its body if it is streamed
+        """
+        body = response.content
+        digest = hashlib.sha256(body).hexdigest()
+        headers = {
+            key: value
+            for key, value in response.headers.items()
+            if key.lower() not in TRANSFER_HEADERS
+        }
+
+        with self.lock:
+            if digest not in self.bodies:
+                data = zlib.compress(body, COMPRESSION_LEVEL)
+                compressed = len(data) < len(body)
+                if not compressed:
+                    data = body
+                if self.pack is None:
+                    self.path.mkdir(parents=True, exist_ok=True)
+                    self.pack = open(self.pack_path, "ab")
+                self.bodies[digest] = [self.pack.tell(), len(data), compressed]
+                self.pack.write(data)
+            self.index[request_key(request)] = {
+                "status": response.status_code,
+                "reason": response.reason,
+                "headers": headers,
+                "sha256": digest,
+                "body": self.bodies[digest],
+            }
+
+    def save(self):
+        with self.lock:
+            if self.pack is not None:
+                self.pack.flush()
+                os.fsync(self.pack.fileno())
+                write_lock(self.index_path, self.index)
+
+    def open(self):
+        """
+        Map the pack into memory for replaying
+        """
+        self.map = b""
+        if self.pack_path.exists() and self.pack_path.stat().st_size:
+            with open(self.pack_path, "rb") as pack:
+                self.map = mmap.mmap(pack.fileno(), 0, access=mmap.ACCESS_READ)
+        return self
+
+    def replay(self, request):
+        """
+        Returns the archived response to a request
+        """
+        entry = self.index.get(request_key(request))
+        if entry is None:
+            raise requests.ConnectionError(
+                f"{request.method} {request.url} is not in {self.path}",
+                request=request,
+            )
+
+        offset, length, compressed = entry["body"]
+        body = self.map[offset : offset + length]
+        if compressed:
+            body = zlib.decompress(body)
+
+        response = requests.Response()
+        response.status_code = entry["status"]
+        response.reason = entry["reason"]
+        response.headers = CaseInsensitiveDict(entry["headers"])
+        response.encoding = get_encoding_from_headers(response.headers)
+        response.url = request.url
+        response.request = request
+        response._content = bytes(body)
+        response._content_consumed = True
+        return response
+
+
+class ReplayAdapter(BaseAdapter):
+    """
+    Adapter answering every request from an archive, without the network
+    """
+
+    def __init__(self, archive):
+        super().__init__()
+        self.archive = archive
+
+    def send(self, request, **kwargs):
+        return self.archive.replay(request)
+
+    def close(self):
+        pass
+
+
+_recording = None
+_replaying = None
+_lock = threading.Lock()
+
+
+def recording():
+    """
+    Returns the archive this process records into, if any
+    """
+    global _recording
+    with _lock:
+        if RECORD and _recording is None:
+            _recording = Archive(RECORD)
+            atexit.register(_recording.save)
+    return _recording
+
+
+def replaying():
+    """
+    Returns the archive this process replays from, if any
+    """
+    global _replaying
+    with _lock:
+        if REPLAY and _replaying is None:
+            _replaying = Archive(REPLAY).open()
+    return _replaying
@@ -0,0 +1,150 @@
+"""
+On-disk HTTP response cache with conditional revalidation.
+
+Responses that carry an ETag or Last-Modified header are stored on disk. Later
+requests for the same URL send If-None-Match/If-Modified-Since, and a 304 is
+answered from the cache, so unchanged endpoints don't transfer their body again.
+The cache is bounded in size, evicting the least recently used entries first.
+"""
+
+import hashlib
+import json
+import os
+import threading
+from pathlib import Path
+
+from requests.adapters import HTTPAdapter
+
+from .metrics import count
+
+CACHE_DIR = Path(
+    os.environ.get("NIX_MINECRAFT_CACHE_DIR")
+    or Path(os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache")
+    / "nix-minecraft"
+    / "http"
+)
+
+# Maximum total size of cached bodies, in bytes
+MAX_SIZE = 256 * 1024 * 1024
+
+
+class ResponseCache:
+    """
+    Stores response bodies and their validators, keyed by URL.
+    Each entry is a `<key>.json` file with the validators and a `<key>.body`
+    file with the decoded body. The body's mtime records when it was last used.
+    """
+
+    def __init__(self, path=CACHE_DIR, max_size=MAX_SIZE):
+        self.path = Path(path)
+        self.max_size = max_size
+        self.size = None
+        self.lock = threading.Lock()
+
+    def _paths(self, url):
+        key = hashlib.sha256(url.encode()).hexdigest()
+        return self.path / f"{key}.json", self.path / f"{key}.body"
+
+    def get(self, url):
+        """
+        Returns `(meta, body)` for a cached URL, or None
+        """
+        meta_path, body_path = self._paths(url)
+        try:
+            meta = json.loads(meta_path.read_text())
+            body = body_path.read_bytes()
+            os.utime(body_path)
+        except (OSError, ValueError):
+            return None
+        return meta, body
+
+    def put(self, url, headers, body):
+        """
+        Store a response body along with the validators from its headers
+        """
+        meta = {
+            "url": url,
+            "etag": headers.get("ETag"),
+            "last_modified": headers.get("Last-Modified"),
+            "content_type": headers.get("Content-Type"),
+        }
+        meta_path, body_path = self._paths(url)
+        self.path.mkdir(parents=True, exist_ok=True)
+
+        with self.lock:
+            old_size = body_path.stat().st_size if body_path.exists() else 0
+            for path, data in ((body_path, body), (meta_path, json.dumps(meta).encode())):
+                tmp = path.with_suffix(path.suffix + f".{threading.get_ident()}.tmp")
+                tmp.write_bytes(data)
+                os.replace(tmp, path)
+
+            if self.size is None:
+                self.size = sum(p.stat().st_size for p in self.path.glob("*.body"))
+            else:
+                self.size += len(body) - old_size
+
+            if self.size > self.max_size:
+                self._evict()
+
+    def _evict(self):
+        bodies = sorted(self.path.glob("*.body"), key=lambda p: p.stat().st_mtime)
+        for body_path in bodies:
+            if self.size <= self.max_size:
+                break
+            self.size -= body_path.stat().st_size
+            body_path.unlink(missing_ok=True)
+            body_path.with_suffix(".json").unlink(missing_ok=True)
+
+
+_default_cache = None
+
+
+def default_cache():
+    """
+    Returns the cache shared by every adapter in this process
+    """
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = ResponseCache()
+    return _default_cache
+
+
+class CachedHTTPAdapter(HTTPAdapter):
+    """
+    HTTPAdapter that revalidates GET requests against a ResponseCache.
+    Streamed requests (such as library downloads) bypass the cache.
+    """
+
+    def __init__(self, *args, **kwargs):
+        self.cache = kwargs.pop("cache", None) or default_cache()
+        super().__init__(*args, **kwargs)
+
+    def send(self, request, **kwargs):
+        if request.method != "GET" or kwargs.get("stream"):
+            return super().send(request, **kwargs)
+
+        cached = self.cache.get(request.url)
+        if cached is not None:
+            meta, body = cached
+            if meta["etag"]:
+                request.headers["If-None-Match"] = meta["etag"]
+            if meta["last_modified"]:
+                request.headers["If-Modified-Since"] = meta["last_modified"]
+
+        response = super().send(request, **kwargs)
+
+        if response.status_code == 304 and cached is not None:
+            count("cache hits")
+            # Drain the empty body so the connection returns to the pool
+            response.content
+            response.status_code = 200
+            response.reason = "OK"
+            response._content = body
+            if meta["content_type"]:
+                response.headers["Content-Type"] = meta["content_type"]
+        elif response.status_code == 200:
+            count("cache misses")
+            if "ETag" in response.headers or "Last-Modified" in response.headers:
+                self.cache.put(request.url, response.headers, response.content)
+
+        return response
@@ -0,0 +1,294 @@
+"""
+HTTP client shared by the update scripts.
+"""
+
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import Retry
+
+from .archive import ReplayAdapter, recording, replaying
+from .cache import CachedHTTPAdapter
+from .fetch import check_cancelled
+from .metrics import span
+
+TIMEOUT = 5
+RETRIES = 5
+
+# Seconds to wait before the nth retry of a request without a Retry-After
+# header is BACKOFF_FACTOR * 2 ** n
+BACKOFF_FACTOR = 1
+
+# Statuses that mean a request can be retried, and which of those mean the
+# host is asking to be sent fewer requests
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+THROTTLE_STATUSES = {429, 503}
+
+# Longest Retry-After that is honoured, in seconds
+MAX_RETRY_AFTER = 120
+
+# Connections kept open per host, which should be at least the number of
+# requests made to a host at once
+POOL_SIZE = 16
+
+# Requests in flight to a host before it has answered any, which grows up to
+# the limiter's `per_host` while it answers quickly and without errors
+INITIAL_HOST_JOBS = 4
+
+# Requests per second started to a host at least, once it has throttled them
+MIN_HOST_RATE = 1
+
+# A host is considered overloaded once its average latency exceeds the lowest
+# one seen by this factor, and by at least LATENCY_SLACK seconds
+LATENCY_FACTOR = 2
+LATENCY_SLACK = 0.25
+
+
+def retry_after(response):
+    """
+    Returns the seconds a response asks to wait before retrying, if any
+    """
+    value = response.headers.get("Retry-After")
+    if value is None:
+        return None
+    try:
+        seconds = float(value)
+    except ValueError:
+        try:
+            seconds = parsedate_to_datetime(value).timestamp() - time.time()
+        except (TypeError, ValueError):
+            return None
+    return min(max(seconds, 0), MAX_RETRY_AFTER)
+
+
+class HostLimit:
+    """
+    Adaptive limits on the requests to a single host: how many are in flight
+    at once, and once the host has throttled any, a token bucket capping the
+    rate they start at. Both grow additively while the host answers, and are
+    halved when it throttles requests, fails them, or slows down. A
+    Retry-After header pauses every request to the host until it has passed.
+    """
+
+    def __init__(self, max_jobs):
+        self.max_jobs = max_jobs
+        self.jobs = min(INITIAL_HOST_JOBS, max_jobs)
+        self.rate = None
+        self.tokens = 0
+        self.refilled = time.monotonic()
+        # Start times of the requests in the last second
+        self.started = deque()
+        self.in_flight = 0
+        self.paused_until = 0
+        self.base_latency = None
+        self.latency = None
+        self.decreased = 0
+        self.condition = threading.Condition()
+
+    def wait_time(self, now):
+        """
+        Returns how long to wait before starting a request, or None to wait
+        for one in flight to finish
+        """
+        if now < self.paused_until:
+            return self.paused_until - now
+        if self.in_flight >= int(self.jobs):
+            return None
+        if self.rate is None:
+            return 0
+        self.tokens = min(
+            max(self.rate, 1), self.tokens + (now - self.refilled) * self.rate
+        )
+        self.refilled = now
+        if self.tokens < 1:
+            return (1 - self.tokens) / self.rate
+        return 0
+
+    def acquire(self):
+        with self.condition:
+            while True:
+                check_cancelled()
+                delay = self.wait_time(time.monotonic())
+                if delay == 0:
+                    break
+                # Wake up regularly to notice cancellation
+                self.condition.wait(min(delay or 1, 1))
+            now = time.monotonic()
+            if self.rate is not None:
+                self.tokens -= 1
+            self.in_flight += 1
+            self.started.append(now)
+            while self.started[0] < now - 1:
+                self.started.popleft()
+
+    def release(self, latency, response):
+        """
+        Adapt the limits to how a request went, given its latency and
+        response, which is None if it failed without one
+        """
+        now = time.monotonic()
+        with self.condition:
+            self.in_flight -= 1
+            status = None if response is None else response.status_code
+
+            if status in THROTTLE_STATUSES:
+                delay = retry_after(response)
+                if delay is not None:
+                    self.paused_until = max(self.paused_until, now + delay)
+            if status == 429:
+                self.decrease(now, rate=True)
+            elif response is None or status in RETRY_STATUSES:
+                self.decrease(now)
+            else:
+                if self.base_latency is None or latency < self.base_latency:
+                    self.base_latency = latency
+                if self.latency is None:
+                    self.latency = latency
+                self.latency += (latency - self.latency) / 5
+                overloaded = self.latency > max(
+                    self.base_latency * LATENCY_FACTOR,
+                    self.base_latency + LATENCY_SLACK,
+                )
+                if overloaded:
+                    self.decrease(now)
+                else:
+                    self.increase()
+            self.condition.notify_all()
+
+    def increase(self):
+        # Roughly one more request in flight, and one more per second, for
+        # every round of requests that succeeds
+        self.jobs = min(self.max_jobs, self.jobs + 1 / self.jobs)
+        if self.rate is not None:
+            self.rate += 1 / self.rate
+
+    def decrease(self, now, rate=False):
+        # Requests already in flight when the limits were lowered report the
+        # same conditions, so only lower them once per round trip
+        if now - self.decreased < (self.latency or 0):
+            return
+        self.decreased = now
+        self.jobs = max(1, self.jobs / 2)
+        if rate and self.rate is None:
+            # Start from the rate requests were being sent at when the host
+            # first throttled them
+            self.rate = len(self.started)
+            self.tokens, self.refilled = 0, now
+        if rate:
+            self.rate = max(MIN_HOST_RATE, self.rate / 2)
+
+
+class RequestLimiter:
+    """
+    Caps the number of requests in flight across every client sharing it,
+    both in total and to any single host, where the cap adapts to how the host
+    responds. For streamed requests, the slot is held until the headers are
+    received.
+    """
+
+    def __init__(self, total, per_host):
+        self.total = threading.BoundedSemaphore(total)
+        self.per_host = per_host
+        self.hosts = {}
+        self.lock = threading.Lock()
+
+    @contextmanager
+    def __call__(self, url):
+        """
+        Hold a slot for a request to `url` while in the context, which yields
+        a function to report the request's response with
+        """
+        host = urlsplit(url).hostname
+        with self.lock:
+            if host not in self.hosts:
+                self.hosts[host] = HostLimit(self.per_host)
+            limit = self.hosts[host]
+
+        # Waiting for the host first keeps a paused host from holding up the
+        # total budget
+        limit.acquire()
+        responses = []
+        start = time.monotonic()
+        try:
+            with self.total:
+                start = time.monotonic()
+                yield responses.append
+        finally:
+            response = responses[0] if responses else None
+            limit.release(time.monotonic() - start, response)
+
+
+class TimeoutHTTPAdapter(CachedHTTPAdapter):
+    """
+    Adapter with a default timeout, which retries requests that fail with one
+    of RETRY_STATUSES and waits for a slot from its limiter before each try
+    """
+
+    def __init__(self, *args, **kwargs):
+        self.timeout = TIMEOUT
+        if "timeout" in kwargs:
+            self.timeout = kwargs["timeout"]
+            del kwargs["timeout"]
+        self.limiter = kwargs.pop("limiter", None) or RequestLimiter(
+            POOL_SIZE, POOL_SIZE
+        )
+        self.archive = recording()
+        super().__init__(*args, **kwargs)
+
+    def send(self, request, **kwargs):
+        timeout = kwargs.get("timeout")
+        if timeout is None:
+            kwargs["timeout"] = self.timeout
+
+        host = urlsplit(request.url).hostname
+        for attempt in range(RETRIES + 1):
+            with self.limiter(request.url) as report, span(
+                host, "request", url=request.url, attempt=attempt
+            ) as details:
+                response = super().send(request, **kwargs)
+                report(response)
+                details["status"] = response.status_code
+                if "Content-Length" in response.headers:
+                    details["bytes"] = int(response.headers["Content-Length"])
+            if response.status_code not in RETRY_STATUSES or attempt == RETRIES:
+                if self.archive is not None:
+                    self.archive.record(request, response)
+                return response
+
+            # Release the connection before waiting to retry
+            response.close()
+            if retry_after(response) is None:
+                time.sleep(BACKOFF_FACTOR * 2**attempt)
+            # Otherwise the limiter holds the retry until the host is ready
+
+
+def make_client(pool_size=POOL_SIZE, limiter=None):
+    """
+    Returns a session with timeouts, retries and response caching.
+    Clients given the same `limiter` share its concurrency budget, and each
+    other client gets its own with `pool_size` requests in flight at most.
+    When replaying an archive, the session answers from it instead.
+    """
+    http = requests.Session()
+    if replaying() is not None:
+        adapter = ReplayAdapter(replaying())
+        http.mount("https://", adapter)
+        http.mount("http://", adapter)
+        return http
+
+    # Retries of failed responses are left to the adapter, so that each one
+    # goes through the limiter
+    retries = Retry(total=RETRIES, backoff_factor=BACKOFF_FACTOR)
+    adapter = TimeoutHTTPAdapter(
+        max_retries=retries,
+        pool_maxsize=pool_size,
+        limiter=limiter or RequestLimiter(pool_size, pool_size),
+    )
+    http.mount("https://", adapter)
+    http.mount("http://", adapter)
+    return http
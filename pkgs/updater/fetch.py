@@ -0,0 +1,58 @@
+"""
+Helpers for running many requests at once.
+"""
+
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+# Default number of requests in flight at once
+JOBS = 8
+
+# Set to stop updates running outside the main thread, which never receive
+# KeyboardInterrupt themselves
+cancelled = threading.Event()
+
+
+def check_cancelled():
+    """
+    Raise KeyboardInterrupt if `cancelled` is set
+    """
+    if cancelled.is_set():
+        raise KeyboardInterrupt
+
+
+def fetch_all(func, items, jobs=JOBS):
+    """
+    Call `func` on each of `items` using up to `jobs` threads, yielding the
+    results in the order of `items`. Calls that haven't started yet are
+    cancelled if iteration stops early, such as on KeyboardInterrupt.
+    """
+    executor = ThreadPoolExecutor(max_workers=jobs)
+    try:
+        for result in executor.map(func, items):
+            check_cancelled()
+            yield result
+    finally:
+        executor.shutdown(cancel_futures=True)
+
+
+class AsyncClient:
+    """
+    Awaitable wrapper around a client from `make_client`.
+    Requests run on worker threads so they keep the session's connection pool,
+    retries and timeouts, with at most `limit` in flight per host.
+    """
+
+    def __init__(self, client, limit=JOBS):
+        self.client = client
+        self.limit = limit
+        self.semaphores = {}
+
+    async def get(self, url):
+        host = urlsplit(url).hostname
+        if host not in self.semaphores:
+            self.semaphores[host] = asyncio.Semaphore(self.limit)
+        async with self.semaphores[host]:
+            return await asyncio.to_thread(self.client.get, url)
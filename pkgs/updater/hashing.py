@@ -0,0 +1,50 @@
+"""
+In-process equivalent of `nix-prefetch-url`.
+"""
+
+import hashlib
+
+# Seconds to wait on a download before giving up, and the number of bytes
+# hashed at a time while streaming it
+TIMEOUT = 30
+CHUNK_SIZE = 64 * 1024
+
+# Nix's base32 alphabet, which omits the letters e, o, t and u
+NIX_BASE32 = "0123456789abcdfghijklmnpqrsvwxyz"
+
+
+def nix_base32(digest):
+    """
+    Encode a digest the same way nix-prefetch-url prints it
+    """
+    length = (len(digest) * 8 - 1) // 5 + 1
+    chars = []
+    for n in reversed(range(length)):
+        i, j = divmod(n * 5, 8)
+        c = digest[i] >> j
+        if i + 1 < len(digest):
+            c |= digest[i + 1] << (8 - j)
+        chars.append(NIX_BASE32[c & 0x1F])
+    return "".join(chars)
+
+
+def hash_url(client, url, algorithm="sha256"):
+    """
+    Stream the file at `url`, returning its digest with `algorithm` and the
+    response's headers
+    """
+    digest = hashlib.new(algorithm)
+    with client.get(url, stream=True, timeout=TIMEOUT) as response:
+        response.raise_for_status()
+        for chunk in response.iter_content(CHUNK_SIZE):
+            digest.update(chunk)
+    return digest.digest(), response.headers
+
+
+def prefetch_url(client, url):
+    """
+    Stream the file at `url` and return its sha256 in Nix's base32 encoding,
+    without buffering the whole file or adding it to the Nix store
+    """
+    digest, _ = hash_url(client, url)
+    return nix_base32(digest)
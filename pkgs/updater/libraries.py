@@ -0,0 +1,306 @@
+"""
+Locking of Maven libraries into the shared `build-support/libraries.json`.
+
+The lock only stores what can't be derived from a library's Maven coordinate,
+in the format
+{
+    "repositories": {id: url, ...},
+    "libraries": {
+        coordinate: {"repo": id, "sha256": string},
+        ...
+    }
+}
+where a library's entry also has a "name" if its file isn't named
+`<artifact>-<version>.jar`. `mkTextileLoader` rebuilds the URLs from it.
+"""
+
+import hashlib
+import threading
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from pathlib import Path
+from urllib.parse import urlsplit
+
+import requests
+
+from .fetch import fetch_all
+from .hashing import CHUNK_SIZE, TIMEOUT, nix_base32, prefetch_url
+from .locks import read_lock, write_lock
+from .metrics import count, span
+
+LIBRARIES = Path(__file__).parent.parent / "build-support" / "libraries.json"
+
+# Maven repositories that libraries are locked against, by id. Repositories
+# not listed here are added under their hostname when first used.
+REPOSITORIES = {
+    "fabric": "https://maven.fabricmc.net/",
+    "quilt": "https://maven.quiltmc.org/repository/release/",
+    "legacy-fabric": "https://maven.legacyfabric.net/",
+}
+_repositories_lock = threading.Lock()
+
+# Mirrors that downloads from a repository are raced against, by repository
+# id, along with a filter on the libraries each one serves. A mirror's copy is
+# only used if it matches the sha1 the repository itself publishes.
+MIRRORS = {
+    "fabric": [
+        (
+            "https://repo1.maven.org/maven2/",
+            lambda name: name.startswith(("org.ow2.asm:", "com.google.")),
+        ),
+    ],
+}
+
+# Seconds a download can take before the same library is also requested from
+# its next mirror
+HEDGE_DELAY = 2
+
+# Maximum number of libraries to prefetch at once
+PREFETCH_JOBS = 8
+
+# Prefetches started by any update in this process, by library, so that a
+# library needed by several ecosystems updated at once is downloaded once
+_prefetches = {}
+_prefetches_lock = threading.Lock()
+
+
+def library_url(name, repo):
+    """
+    Returns the URL of the jar for a Maven coordinate in the repository `repo`
+    """
+    ldir, lname, lversion = name.split(":")
+    return "/".join(
+        (
+            repo.rstrip("/"),
+            ldir.replace(".", "/"),
+            lname,
+            lversion,
+            f"{lname}-{lversion}.jar",
+        )
+    )
+
+
+def read_libraries():
+    """
+    Returns the locked libraries, registering the repositories they use
+    """
+    data = read_lock(LIBRARIES)
+    with _repositories_lock:
+        for id, url in data.get("repositories", {}).items():
+            REPOSITORIES.setdefault(id, url)
+    return data.get("libraries", {})
+
+
+def write_libraries(libraries):
+    """
+    Atomically writes the locked libraries with the repositories they use
+    """
+    used = {entry["repo"] for entry in libraries.values()}
+    with _repositories_lock:
+        repositories = {id: url for id, url in REPOSITORIES.items() if id in used}
+    write_lock(LIBRARIES, {"repositories": repositories, "libraries": libraries})
+
+
+def repository_id(url):
+    """
+    Returns the id of the repository at `url`, registering it if it is new.
+    Prefetches call this from many threads at once, so REPOSITORIES is only
+    read or changed while holding its lock.
+    """
+    url = url.rstrip("/") + "/"
+    with _repositories_lock:
+        for id, root in REPOSITORIES.items():
+            if root == url:
+                return id
+        id = urlsplit(url).hostname
+        REPOSITORIES[id] = url
+    return id
+
+
+def locked_url(name, entry):
+    """
+    Returns the URL of a locked library
+    """
+    with _repositories_lock:
+        root = REPOSITORIES[entry["repo"]]
+    return library_url(name, root)
+
+
+def download(client, url, stop):
+    """
+    Stream the file at `url`, returning its sha256 and sha1 digests, or None
+    if `stop` is set before it completes
+    """
+    sha256, sha1 = hashlib.sha256(), hashlib.sha1()
+    with client.get(url, stream=True, timeout=TIMEOUT) as response:
+        response.raise_for_status()
+        for chunk in response.iter_content(CHUNK_SIZE):
+            if stop.is_set():
+                return None
+            sha256.update(chunk)
+            sha1.update(chunk)
+    return sha256.digest(), sha1.hexdigest()
+
+
+def published_sha1(client, url):
+    """
+    Returns the sha1 that a Maven repository publishes for the file at `url`,
+    or None if it publishes none
+    """
+    try:
+        response = client.get(url + ".sha1", timeout=TIMEOUT)
+        response.raise_for_status()
+    except requests.RequestException:
+        return None
+    # Some repositories follow the digest with the file name
+    words = response.text.split()
+    return words[0].lower() if words else None
+
+
+def prefetch_hedged(client, logger, url, mirrors):
+    """
+    Prefetch the file at `url` like `prefetch_url`, also requesting it from
+    each of `mirrors` in turn whenever the downloads so far have taken
+    HEDGE_DELAY seconds or failed. The first download from `url`, or from a
+    mirror matching the sha1 published alongside `url`, is used.
+    """
+    mirrors = list(mirrors)
+    stop = threading.Event()
+    executor = ThreadPoolExecutor(max_workers=len(mirrors) + 1)
+    pending = {executor.submit(download, client, url, stop): url}
+    error = None
+    expected = None
+
+    try:
+        while pending:
+            timeout = HEDGE_DELAY if mirrors else None
+            done, _ = wait(pending, timeout, return_when=FIRST_COMPLETED)
+            for future in done:
+                source = pending.pop(future)
+                try:
+                    sha256, sha1 = future.result()
+                except requests.RequestException as e:
+                    logger.debug(f"Failed to fetch {source}: {e}")
+                    error = error or e
+                    continue
+                if source == url:
+                    return nix_base32(sha256)
+
+                expected = expected or published_sha1(client, url)
+                if sha1 == expected:
+                    logger.debug(f"Using {source}")
+                    return nix_base32(sha256)
+                logger.debug(f"Ignoring {source}, which doesn't match {url}")
+
+            # Hedge when the downloads in flight are slow, or have all failed
+            if mirrors and (not done or not pending):
+                mirror = mirrors.pop(0)
+                pending[executor.submit(download, client, mirror, stop)] = mirror
+    finally:
+        stop.set()
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    raise error or requests.RequestException(f"No mirror of {url} matches it")
+
+
+def fetch_library(client, logger, name, url):
+    """
+    Prefetch a single Maven library, returning its entry in libraries.json
+    """
+    logger.info(f"Fetching {name}")
+    lurl = library_url(name, url)
+    repo = repository_id(url)
+    mirrors = [
+        library_url(name, mirror)
+        for mirror, serves in MIRRORS.get(repo, [])
+        if serves(name)
+    ]
+
+    try:
+        with span(name, "download", url=lurl):
+            if mirrors:
+                lhash = prefetch_hedged(client, logger, lurl, mirrors)
+            else:
+                lhash = prefetch_url(client, lurl)
+    except requests.RequestException as e:
+        # Leave the hash empty, so that the versions needing the library aren't
+        # locked, and the next run fetches them again and retries it
+        logger.warning(f"Failed to fetch {name}: {e}")
+        lhash = ""
+
+    return {"repo": repo, "sha256": lhash}
+
+
+def fetch_library_once(client, logger, name, url):
+    """
+    Prefetch a library like `fetch_library`, unless it has already been
+    prefetched in this process, in which case the same entry is returned once
+    that prefetch completes
+    """
+    with _prefetches_lock:
+        future = _prefetches.get(name)
+        started = future is None
+        if started:
+            future = _prefetches[name] = Future()
+
+    if started:
+        try:
+            future.set_result(fetch_library(client, logger, name, url))
+        except BaseException as e:
+            future.set_exception(e)
+    else:
+        logger.debug(f"Sharing the prefetch of {name}")
+        count(f"{logger.name} shared")
+    return dict(future.result())
+
+
+def collect_garbage(libraries, locks):
+    """
+    Removes the libraries that none of the version locks at the paths `locks`
+    reference. Returns the removed libraries, and the references to libraries
+    that aren't locked as a dict of names to (lock path, version) pairs.
+    """
+    referrers = {}
+    for path in locks:
+        for version, entry in read_lock(path).items():
+            for name in entry["libraries"]:
+                referrers.setdefault(name, []).append((path, version))
+
+    orphans = [name for name in libraries if name not in referrers]
+    for name in orphans:
+        del libraries[name]
+
+    dangling = {
+        name: refs for name, refs in referrers.items() if name not in libraries
+    }
+    return orphans, dangling
+
+
+def prefetch_libraries(client, logger, needed, libraries, checkpoint=None):
+    """
+    Prefetch each library in `needed`, a dict of names to Maven repositories,
+    that isn't already locked, using up to PREFETCH_JOBS concurrent downloads.
+    Libraries that another update in this process prefetches as well are only
+    downloaded once.
+    Results are merged into `libraries` in the order of `needed`, so the
+    lockfile stays stable, and `checkpoint` is called after each one.
+    """
+    logger = logger.getChild("libraries")
+    missing = {}
+
+    for name, url in needed.items():
+        if not name in libraries or any(not v for k, v in libraries[name].items()):
+            missing[name] = url
+        else:
+            logger.debug(f"Using cached {name}")
+            count(f"{logger.name} already locked")
+
+    logger.info(f"Prefetching {len(missing)} of {len(needed)} libraries")
+    results = fetch_all(
+        lambda item: fetch_library_once(client, logger, *item),
+        missing.items(),
+        PREFETCH_JOBS,
+    )
+    for name, entry in zip(missing, results):
+        libraries[name] = entry
+        if checkpoint is not None:
+            checkpoint()
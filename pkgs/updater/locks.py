@@ -0,0 +1,94 @@
+"""
+Reading and writing of the JSON lockfiles.
+
+Lockfiles are written atomically, so an interrupted update never leaves one
+truncated, and long updates checkpoint their progress as they go.
+"""
+
+import json
+import os
+import signal
+import tempfile
+import time
+
+from .metrics import span
+
+# Minimum number of seconds between checkpoints of an update in progress
+CHECKPOINT_INTERVAL = 30
+
+
+def read_lock(path):
+    """
+    Returns the contents of a lockfile, or an empty dict if it is missing or empty
+    """
+    if not path.exists() or path.stat().st_size == 0:
+        return {}
+    return json.loads(path.read_text())
+
+
+def write_lock(path, data):
+    """
+    Atomically replace a lockfile by writing a temporary file next to it and
+    renaming it into place
+    """
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+    try:
+        with span(path.name, "write", path=str(path)), os.fdopen(fd, "w") as lock:
+            json.dump(data, lock, indent=2)
+            lock.write("\n")
+            lock.flush()
+            os.fsync(lock.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+class Checkpoint:
+    """
+    Calls `save` at most once every `interval` seconds when called, so that
+    a crash or kill only loses the progress made since the last checkpoint
+    """
+
+    def __init__(self, save, interval=CHECKPOINT_INTERVAL):
+        self.save = save
+        self.interval = interval
+        self.last = time.monotonic()
+
+    def __call__(self, force=False):
+        if force or time.monotonic() - self.last >= self.interval:
+            self.save()
+            self.last = time.monotonic()
+
+
+def interrupt_on_sigterm():
+    """
+    Handle SIGTERM like Ctrl-C, so that updates still write their progress
+    when killed
+    """
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
+
+
+def read_shards(path):
+    """
+    Returns the contents of a sharded lock: a directory holding a `<key>.json`
+    shard for each key in the "versions" of its `index.json`
+    """
+    index = read_lock(path / "index.json")
+    return {key: read_lock(path / f"{key}.json") for key in index.get("versions", {})}
+
+
+def write_shards(path, shards, index):
+    """
+    Write the shards of a sharded lock that changed and remove the ones that
+    are gone, then write its index
+    """
+    path.mkdir(exist_ok=True)
+    for key, data in shards.items():
+        shard = path / f"{key}.json"
+        if read_lock(shard) != data:
+            write_lock(shard, data)
+    for shard in path.glob("*.json"):
+        if shard.name != "index.json" and shard.stem not in shards:
+            shard.unlink()
+    write_lock(path / "index.json", index)
@@ -0,0 +1,216 @@
+"""
+Timing and counters for update runs.
+
+Updates record spans of time, such as each phase, request and lockfile write,
+and counters, such as cache hits, into the process-wide `recorder`. Nothing is
+recorded unless a run asks for a JSON summary or a Chrome trace, which
+chrome://tracing and Perfetto open, with the options from `add_arguments`.
+"""
+
+import json
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from pathlib import Path
+
+# Seconds between the stack samples taken with --profile
+PROFILE_INTERVAL = 0.005
+
+
+class Recorder:
+    def __init__(self):
+        self.enabled = False
+        self.origin = time.perf_counter()
+        self.spans = []
+        self.threads = {}
+        self.counters = Counter()
+        self.lock = threading.Lock()
+
+    def start(self):
+        self.enabled = True
+        self.origin = time.perf_counter()
+
+    @contextmanager
+    def span(self, name, category="phase", **args):
+        """
+        Record the time spent in the context, which yields `args` so that
+        details known only at the end, such as a status code, can be added
+        """
+        if not self.enabled:
+            yield args
+            return
+        start = time.perf_counter()
+        try:
+            yield args
+        except BaseException as e:
+            args["error"] = type(e).__name__
+            raise
+        finally:
+            end = time.perf_counter()
+            thread = threading.current_thread()
+            self.threads[thread.ident] = thread.name
+            self.spans.append((name, category, start, end, thread.ident, args))
+
+    def count(self, name, n=1):
+        if self.enabled:
+            with self.lock:
+                self.counters[name] += n
+
+    def summary(self):
+        """
+        Returns the total time, count and details of each span by category
+        and name, along with the counters
+        """
+        spans = {}
+        for name, category, start, end, _, args in list(self.spans):
+            entry = spans.setdefault(category, {}).setdefault(
+                name, {"count": 0, "seconds": 0}
+            )
+            entry["count"] += 1
+            entry["seconds"] += end - start
+            if "bytes" in args:
+                entry["bytes"] = entry.get("bytes", 0) + args["bytes"]
+            if args.get("attempt"):
+                entry["retries"] = entry.get("retries", 0) + 1
+            for key, field in (("status", "statuses"), ("error", "errors")):
+                if key in args:
+                    counts = entry.setdefault(field, {})
+                    counts[str(args[key])] = counts.get(str(args[key]), 0) + 1
+        return {
+            "seconds": time.perf_counter() - self.origin,
+            "spans": spans,
+            "counters": dict(self.counters),
+        }
+
+    def trace(self):
+        """
+        Returns the spans in the Chrome trace event format
+        """
+        micros = lambda t: round((t - self.origin) * 1e6)
+        pid = os.getpid()
+        events = [
+            {
+                "name": name,
+                "cat": category,
+                "ph": "X",
+                "ts": micros(start),
+                "dur": micros(end) - micros(start),
+                "pid": pid,
+                "tid": tid,
+                "args": args,
+            }
+            for name, category, start, end, tid, args in list(self.spans)
+        ]
+        events += [
+            {
+                "name": "thread_name",
+                "ph": "M",
+                "pid": pid,
+                "tid": tid,
+                "args": {"name": name},
+            }
+            for tid, name in list(self.threads.items())
+        ]
+        return {
+            "traceEvents": events,
+            "otherData": {"counters": dict(self.counters)},
+        }
+
+
+recorder = Recorder()
+span = recorder.span
+count = recorder.count
+
+
+class Profiler(threading.Thread):
+    """
+    Samples the stack of every other thread each `interval` seconds, whether
+    it is running or waiting on the network, counting identical stacks
+    """
+
+    def __init__(self, interval=PROFILE_INTERVAL):
+        super().__init__(name="profiler", daemon=True)
+        self.interval = interval
+        self.stacks = Counter()
+        self.stopped = threading.Event()
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for tid, frame in sys._current_frames().items():
+                if tid == self.ident:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    path = Path(code.co_filename).name
+                    stack.append(f"{code.co_name} ({path}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                stack.append(names.get(tid, str(tid)))
+                self.stacks[";".join(reversed(stack))] += 1
+
+    def stop(self):
+        self.stopped.set()
+        self.join()
+
+    def write(self, path):
+        """
+        Write the samples as folded stacks, which flamegraph.pl, speedscope
+        and inferno read
+        """
+        with open(path, "w") as output:
+            for stack, samples in self.stacks.most_common():
+                output.write(f"{stack} {samples}\n")
+
+
+def add_arguments(parser):
+    group = parser.add_argument_group("instrumentation")
+    group.add_argument(
+        "--metrics",
+        metavar="FILE",
+        help="write the time spent in each phase, requests by host and counters"
+        " to FILE as JSON",
+    )
+    group.add_argument(
+        "--trace",
+        metavar="FILE",
+        help="write a Chrome trace of the run to FILE, for Perfetto or"
+        " chrome://tracing",
+    )
+    group.add_argument(
+        "--profile",
+        metavar="FILE",
+        help="sample the stacks of the run into FILE, as folded stacks for"
+        " flamegraph.pl or speedscope",
+    )
+
+
+@contextmanager
+def instrument(args):
+    """
+    Record the run in the context as asked by the options from
+    `add_arguments`, writing the results when it exits, even if it fails
+    """
+    if args.metrics or args.trace:
+        recorder.start()
+    profiler = None
+    if args.profile:
+        profiler = Profiler()
+        profiler.start()
+
+    try:
+        yield
+    finally:
+        if profiler is not None:
+            profiler.stop()
+            profiler.write(args.profile)
+        if args.metrics:
+            with open(args.metrics, "w") as output:
+                json.dump(recorder.summary(), output, indent=2)
+                output.write("\n")
+        if args.trace:
+            with open(args.trace, "w") as output:
+                json.dump(recorder.trace(), output)
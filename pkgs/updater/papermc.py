@@ -0,0 +1,394 @@
+"""
+Update logic shared by the PaperMC projects (Paper and Velocity).
+
+Each project's `update.py` is a plugin module passed to `run`, declaring:
+
+- `ENDPOINT`: the project's endpoint in the PaperMC v2 API
+- `LOCK_CHANNEL`: whether to record each build's release channel
+- `LATEST_BUILD_FILTER`: which locked builds the project's default package
+  may point to
+- `RETAIN_LATEST`, `RETAIN_SINCE`, `RETAIN_BUILDS`: the retention policy of
+  the lock, see `retain`
+
+The lock is sharded into `locks/<version>.json` files holding the builds of
+each version, and `locks/index.json` listing every version's build numbers,
+its latest build and the latest build overall. Nix can then evaluate the
+package set from the index alone, and only read the shard of a version when
+one of its builds is used.
+
+Builds are fetched per version group (e.g. "1.20" for 1.20 to 1.20.6), which
+the API lists the builds of every version of in one response. The index also
+records each version's group, so that later updates know which groups to
+fetch without looking them up again.
+
+Only what can't be derived from a build's version and number is locked: its
+hash, its file name if it isn't `<NAME>-<version>-<build>.jar`, and, with
+`LOCK_CHANNEL`, its channel if it isn't "default". The Nix expressions rebuild
+each build's download URL from these.
+"""
+
+import argparse
+import asyncio
+from pathlib import Path
+
+from .client import make_client
+from .fetch import JOBS, AsyncClient, check_cancelled
+from .locks import (
+    Checkpoint,
+    interrupt_on_sigterm,
+    read_lock,
+    read_shards,
+    write_lock,
+    write_shards,
+)
+from .metrics import add_arguments, count, instrument, span
+from .versions import version_key
+
+# Number of newest versions to refetch during an incremental update, as older
+# versions rarely receive new builds
+REFRESH_RECENT = 3
+
+
+def get_versions(plugin, client):
+    """
+    Returns the project's versions and version groups, from oldest to newest
+    """
+    print("Fetching versions")
+    data = client.get(plugin.ENDPOINT).json()
+    return data["versions"], data.get("version_groups", [])
+
+
+async def get_builds(plugin, version, client):
+    print(f"Fetching builds for {version}")
+    data = (await client.get(f"{plugin.ENDPOINT}/versions/{version}/builds")).json()
+    return data["builds"]
+
+
+async def get_group_builds(plugin, group, client):
+    """
+    Returns the builds of every version in a version group, by version
+    """
+    print(f"Fetching builds for group {group}")
+    url = f"{plugin.ENDPOINT}/version_group/{group}/builds"
+    data = (await client.get(url)).json()
+    builds = {version: [] for version in data["versions"]}
+    for build in data["builds"]:
+        builds.setdefault(build["version"], []).append(build)
+    return builds
+
+
+async def get_all_builds(
+    plugin, versions, all_groups, groups, client, fetched, checkpoint
+):
+    """
+    Fetch the builds of every version concurrently into `fetched`, with one
+    request per version group, calling `checkpoint` as each one completes.
+    `groups` holds the known group of each version, and the groups of new
+    versions are found by fetching the other groups from newest to oldest, in
+    waves that double in size, until every version is found. New versions are
+    nearly always in the newest group, so that usually takes one request.
+    Versions that aren't in any group are fetched on their own.
+    """
+    wanted = set(versions)
+
+    async def fetch_group(group):
+        check_cancelled()
+        builds = await get_group_builds(plugin, group, client)
+        for version in builds:
+            groups[version] = group
+            if version in wanted:
+                fetched[version] = builds[version]
+        checkpoint()
+
+    async def fetch(version):
+        check_cancelled()
+        fetched[version] = await get_builds(plugin, version, client)
+        checkpoint()
+
+    known = {groups[v] for v in versions if groups.get(v) in all_groups}
+    await asyncio.gather(*(fetch_group(group) for group in known))
+
+    others = [group for group in reversed(all_groups) if group not in known]
+    wave = 1
+    while others and not wanted <= fetched.keys():
+        await asyncio.gather(*(fetch_group(group) for group in others[:wave]))
+        others = others[wave:]
+        wave *= 2
+
+    await asyncio.gather(*(fetch(v) for v in versions if v not in fetched))
+
+
+def lock_build(plugin, version, build):
+    """
+    Returns the lock entry of a build from the API
+    """
+    download = build["downloads"]["application"]
+    entry = {"sha256": download["sha256"]}
+    if download["name"] != f"{plugin.NAME}-{version}-{build['build']}.jar":
+        entry["name"] = download["name"]
+    if plugin.LOCK_CHANNEL and build["channel"] != "default":
+        entry["channel"] = build["channel"]
+    return entry
+
+
+def build_url(plugin, version, build, entry):
+    """
+    Returns the download URL of a locked build, like the Nix expressions do
+    """
+    name = entry.get("name", f"{plugin.NAME}-{version}-{build}.jar")
+    return f"{plugin.ENDPOINT}/versions/{version}/builds/{build}/downloads/{name}"
+
+
+def build_key(version):
+    """
+    Returns a sort key for the build numbers of `version`, ordering them like
+    Nix's `versionOlder`
+    """
+    return lambda build: version_key(f"{version}-build.{build}")
+
+
+def retain(plugin, version, builds, times):
+    """
+    Returns `builds` without the ones dropped by the plugin's retention policy.
+    A build is kept if it is one of the `RETAIN_LATEST` newest builds of its
+    version, was published on or after the date `RETAIN_SINCE`, or is listed
+    under its version in `RETAIN_BUILDS`. The newest build matching
+    `LATEST_BUILD_FILTER` is always kept, and if none of the three are set,
+    every build is.
+
+    `times` holds the publishing time of the builds known to the API, and
+    builds without one are never kept by `RETAIN_SINCE`.
+    """
+    policy = (plugin.RETAIN_LATEST, plugin.RETAIN_SINCE, plugin.RETAIN_BUILDS or None)
+    if all(rule is None for rule in policy):
+        return builds
+
+    numbers = sorted(builds, key=build_key(version))
+    keep = {str(build) for build in plugin.RETAIN_BUILDS.get(version, [])}
+    if plugin.RETAIN_LATEST is not None:
+        keep.update(numbers[len(numbers) - plugin.RETAIN_LATEST :])
+    if plugin.RETAIN_SINCE is not None:
+        keep.update(n for n in numbers if times.get(n, "") >= plugin.RETAIN_SINCE)
+    candidates = [n for n in numbers if plugin.LATEST_BUILD_FILTER(builds[n])]
+    keep.update(candidates[-1:])
+
+    return {n: builds[n] for n in numbers if n in keep}
+
+
+def lock_versions(plugin, versions, all_versions, fetched, full):
+    """
+    Returns the lock for `all_versions`, from the existing lock and the builds
+    fetched so far. Versions that haven't been fetched keep their locked
+    builds, or are left out if they have none yet. The retention policy is
+    applied to the builds of fetched versions, so builds already locked for
+    other versions are only pruned once those are refetched.
+    """
+    output = {}
+
+    for version in all_versions:
+        if version in fetched:
+            builds = {} if full else dict(versions.get(version, {}))
+            times = {}
+            for build in fetched[version]:
+                number = str(build["build"])
+                builds[number] = lock_build(plugin, version, build)
+                times[number] = build.get("time", "")
+            output[version] = retain(plugin, version, builds, times)
+        elif version in versions:
+            output[version] = versions[version]
+
+    return output
+
+
+def gen_index(plugin, output, groups):
+    """
+    Returns the index of a lock, in the format
+    {
+        "versions": {
+            version: {"builds": [string, ...], "latest": string, "group": string},
+            ...
+        },
+        "latest": {"version": string, "build": string}
+    }
+    with builds ordered from oldest to newest like Nix's `versionOlder`.
+    Versions without builds are left out, and a version's group is only
+    present if it is in `groups`. Returns None if no build passes the plugin's
+    LATEST_BUILD_FILTER, as there is no latest build to index then.
+    """
+    versions = {}
+    latest = []
+    for version, builds in output.items():
+        if not builds:
+            continue
+        numbers = sorted(builds, key=build_key(version))
+        versions[version] = {"builds": numbers, "latest": numbers[-1]}
+        if version in groups:
+            versions[version]["group"] = groups[version]
+
+        candidates = [n for n in numbers if plugin.LATEST_BUILD_FILTER(builds[n])]
+        if candidates:
+            latest.append((version, candidates[-1]))
+
+    if not latest:
+        return None
+    version, build = max(latest, key=lambda item: build_key(item[0])(item[1]))
+    return {"versions": versions, "latest": {"version": version, "build": build}}
+
+
+def read_groups(path):
+    """
+    Returns the version group of each version in the index of a lock
+    """
+    index = read_lock(path / "index.json")
+    return {
+        version: info["group"]
+        for version, info in index.get("versions", {}).items()
+        if "group" in info
+    }
+
+
+def write_locks(plugin, path, output, groups):
+    shards = {version: builds for version, builds in output.items() if builds}
+    index = gen_index(plugin, shards, groups)
+    if index is None:
+        # Keep the existing lock, which Nix can still evaluate
+        print("No latest build to index, not writing the lock")
+        return
+    write_shards(path, shards, index)
+
+
+def main(
+    plugin,
+    versions,
+    groups,
+    client,
+    save,
+    full=False,
+    recent=REFRESH_RECENT,
+    done=(),
+):
+    """
+    Takes in a dict of the existing lock and a client, returning the new lock.
+    Unless `full` is set, only versions that aren't locked yet and the `recent`
+    newest versions are refetched, with their new builds merged into the
+    existing ones. All other versions are kept as-is. `groups` holds the known
+    version group of each version, and is updated in place.
+
+    Versions in `done` were already refetched by an interrupted run and are
+    skipped. `save` is called periodically, and when interrupted, with the
+    lock so far and the list of versions refetched so far.
+    """
+    print("Starting fetch")
+
+    with span(f"{plugin.NAME} versions"):
+        all_versions, all_groups = get_versions(plugin, client)
+    stale = [
+        version
+        for i, version in enumerate(all_versions)
+        if (full or version not in versions or i >= len(all_versions) - recent)
+        and version not in done
+    ]
+    print(f"Refetching {len(stale)} of {len(all_versions)} versions")
+    count(f"{plugin.NAME} versions skipped", len(all_versions) - len(stale))
+
+    fetched = {}
+    lock = lambda: lock_versions(plugin, versions, all_versions, fetched, full)
+    checkpoint = Checkpoint(lambda: save(lock(), [*done, *fetched]))
+    try:
+        with span(f"{plugin.NAME} builds"):
+            asyncio.run(
+                get_all_builds(
+                    plugin,
+                    stale,
+                    all_groups,
+                    groups,
+                    AsyncClient(client),
+                    fetched,
+                    checkpoint,
+                )
+            )
+    except BaseException:
+        print("Fetching stopped, writing progress")
+        checkpoint(force=True)
+        raise
+
+    return lock()
+
+
+def update(plugin, client=None, full=False, recent=REFRESH_RECENT, resume=False):
+    """
+    Update the sharded lock next to the plugin, returning counts of what was
+    added. Progress is recorded in locks.progress until the update completes,
+    so that an interrupted update can be continued with `resume`, which also
+    continues a full refresh if the interrupted update was one.
+    """
+    folder = Path(plugin.__file__).parent
+    lock_path = folder / "locks"
+    progress_path = folder / "locks.progress"
+    versions = read_shards(lock_path)
+    groups = read_groups(lock_path)
+    done = []
+    if resume:
+        progress = read_lock(progress_path)
+        done = progress.get("done", [])
+        full = full or progress.get("full", False)
+
+    def save(output, done):
+        write_locks(plugin, lock_path, output, groups)
+        write_lock(progress_path, {"full": full, "done": done})
+
+    output = main(
+        plugin,
+        versions,
+        groups,
+        client or make_client(JOBS),
+        save,
+        full=full,
+        recent=recent,
+        done=done,
+    )
+
+    write_locks(plugin, lock_path, output, groups)
+    progress_path.unlink(missing_ok=True)
+
+    pruned = sum(
+        len(builds.keys() - output.get(version, {}).keys())
+        for version, builds in versions.items()
+    )
+    if pruned:
+        print(f"Pruned {pruned} builds")
+    return {
+        "versions": len(output.keys() - versions.keys()),
+        "builds": sum(
+            len(builds.keys() - versions.get(version, {}).keys())
+            for version, builds in output.items()
+        ),
+    }
+
+
+def run(plugin):
+    interrupt_on_sigterm()
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--full",
+        action="store_true",
+        help="refetch the builds of every version instead of only new and recent ones",
+    )
+    parser.add_argument(
+        "--recent",
+        type=int,
+        default=REFRESH_RECENT,
+        metavar="N",
+        help="number of newest versions to refetch during an incremental update",
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="skip versions already refetched by an interrupted update",
+    )
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    with instrument(args):
+        update(plugin, full=args.full, recent=args.recent, resume=args.resume)
@@ -0,0 +1,323 @@
+"""
+Update logic shared by the Fabric, Quilt and Legacy Fabric ("textile") servers.
+
+Each ecosystem's `update.py` is a plugin module passed to `run`, declaring:
+
+- `NAME`: the ecosystem's name, used for logging
+- `ENDPOINT`: the meta API's versions endpoint
+- `MAVEN`: the Maven repository the loader is fetched from
+- `GAME_LIBRARIES`: a dict of each mapping type locked per game version
+  (e.g. "intermediary") to the Maven repository it is fetched from
+- `LOADER_GAME_VERSION`: a game version to query loader information with, as
+  the meta APIs don't expose it without one
+- `LOADER_VERSION_FILTER` and `GAME_VERSION_FILTER`: which loader and game
+  versions to package, given the version objects returned by the meta API
+"""
+
+import argparse
+import logging
+import threading
+from functools import lru_cache
+from pathlib import Path
+
+import jq
+
+from .client import make_client
+from .fetch import fetch_all
+from .libraries import (
+    PREFETCH_JOBS,
+    prefetch_libraries,
+    read_libraries,
+    write_libraries,
+)
+from .locks import Checkpoint, interrupt_on_sigterm, read_lock, write_lock
+from .metrics import add_arguments, count, instrument, span
+
+logging.basicConfig(level=logging.INFO)
+
+
+def get(plugin, client, *args: str):
+    return client.get("/".join((plugin.ENDPOINT,) + args)).json()
+
+
+def get_game_versions(plugin, client, logger):
+    """
+    Returns a list of game versions that the loader supports, filtered
+    using the plugin's GAME_VERSION_FILTER. The `version` variable is in the format
+    {"verson": string, "stable": bool}
+    """
+    logger.info("Fetching game versions")
+    data = get(plugin, client, "game")
+    return [
+        version["version"] for version in data if plugin.GAME_VERSION_FILTER(version)
+    ]
+
+
+def get_loader_versions(plugin, client, logger):
+    """
+    Returns a list of the loader versions that should be packaged, filtered
+    using the plugin's LOADER_VERSION_FILTER. The `version` variable is in the format
+    {"separater": string, "build": int, "maven": string, "version": string, "stable": bool}
+    """
+    logger.info("Fetching loader versions")
+    data = get(plugin, client, "loader")
+    return [
+        version["version"]
+        for version in data
+        if plugin.LOADER_VERSION_FILTER(version)
+    ]
+
+
+@lru_cache
+def loader_program(maven):
+    """
+    Returns the jq program extracting the loader information from the meta
+    API, compiled once for each Maven repository the loader is fetched from
+    """
+    return jq.compile(
+        "{"
+        "mainClass: .launcherMeta.mainClass.server,"
+        "libraries: ((.launcherMeta.libraries | [.common[], .server[]]) + [{name: .loader.maven, url: $URL}])"
+        "}",
+        args={"URL": maven},
+    )
+
+
+def fetch_loader_version(plugin, client, loader_version):
+    """
+    Return the loader information for a given loader version
+    """
+    return loader_program(plugin.MAVEN).input_value(
+        get(plugin, client, "loader", plugin.LOADER_GAME_VERSION, loader_version)
+    ).first()
+
+
+def get_mappings(plugin, client, logger):
+    """
+    Returns an index of each of the plugin's GAME_LIBRARIES to the Maven
+    coordinate of that mapping for every game version, from the full mapping
+    listings. This takes one request per mapping type instead of one per
+    mapping type and game version.
+    """
+    index = {}
+    for item in plugin.GAME_LIBRARIES:
+        logger.info(f"Fetching {item} versions")
+        index[item] = {}
+        for mapping in get(plugin, client, item):
+            # Keep the first entry, like the per-version endpoint
+            index[item].setdefault(mapping["version"], mapping["maven"])
+    return index
+
+
+def lazy_mappings(plugin, client, logger):
+    """
+    Returns a function returning the index from `get_mappings`, which fetches
+    it on the first call only, so runs without new game versions skip it
+    """
+    mappings = None
+    lock = threading.Lock()
+
+    def get_():
+        nonlocal mappings
+        with lock:
+            if mappings is None:
+                with span(f"{plugin.NAME} mappings"):
+                    mappings = get_mappings(plugin, client, logger)
+        return mappings
+
+    return get_
+
+
+def fetch_game_version(plugin, client, game_version, mappings):
+    """
+    Return game-version-specific libraries for a given game version, falling
+    back to the per-version endpoint for game versions missing from the index
+    returned by `mappings`
+    """
+
+    def get_(item):
+        index = mappings()[item]
+        if game_version in index:
+            return index[game_version]
+        return get(plugin, client, item, game_version)[0]["maven"]
+
+    return {
+        "libraries": [
+            {"name": get_(item), "url": repo}
+            for item, repo in plugin.GAME_LIBRARIES.items()
+        ]
+    }
+
+
+def gen_loader_locks(version):
+    """
+    Return the lock information for a given loader version, returned in the format
+    {
+        "mainClass": string,
+        "libraries": [string, ...]
+    }
+    where each library is a key into libraries.json
+    """
+    return {
+        "mainClass": version["mainClass"],
+        "libraries": [library["name"] for library in version["libraries"]],
+    }
+
+
+def gen_game_locks(version):
+    """
+    Return the lock information for a given game version, returned in the format
+    {
+        "libraries": [string, ...]
+    }
+    where each library is a key into libraries.json
+    """
+    return {"libraries": [library["name"] for library in version["libraries"]]}
+
+
+def fetch_versions(logger, versions, locked, fetch, fetched):
+    """
+    Fetch the information of each of `versions` that isn't locked yet into
+    `fetched`, using up to PREFETCH_JOBS concurrent requests
+    """
+    missing = []
+    for version in versions:
+        if not locked.get(version, None):
+            missing.append(version)
+        else:
+            logger.info(f"Version {version} already locked")
+            count(f"{logger.name} versions already locked")
+
+    def fetch_version(version):
+        logger.info(f"Fetching version: {version}")
+        return fetch(version)
+
+    for version, info in zip(missing, fetch_all(fetch_version, missing, PREFETCH_JOBS)):
+        fetched[version] = info
+
+
+def main(plugin, client, versions_loader, versions_game, libraries, checkpoint):
+    """
+    Fetch the relevant information and update the locks in place.
+    `versions_loader`, `versions_game` and `libraries` are data from the
+    existing lockfiles, and `checkpoint` is called after each locked library.
+
+    The information of every new version is fetched first, so that each
+    library they need is prefetched exactly once even when many versions
+    share it. The version locks are then generated from it. Only versions whose
+    libraries are all locked with a hash are added, so versions left out by an
+    interruption or a failed download are fetched again on the next run.
+    """
+    logger = logging.getLogger(plugin.NAME)
+
+    with span(f"{plugin.NAME} version lists"):
+        loader_versions = get_loader_versions(plugin, client, logger)
+        game_versions = get_game_versions(plugin, client, logger)
+    mappings = lazy_mappings(plugin, client, logger)
+
+    fetched_loader = {}
+    fetched_game = {}
+
+    logger.info("Starting fetch")
+    try:
+        logger.info("Fetching loader versions")
+        with span(f"{plugin.NAME} loader versions"):
+            fetch_versions(
+                logger.getChild("loader"),
+                loader_versions,
+                versions_loader,
+                lambda version: fetch_loader_version(plugin, client, version),
+                fetched_loader,
+            )
+
+        logger.info("Fetching game versions")
+        with span(f"{plugin.NAME} game versions"):
+            fetch_versions(
+                logger.getChild("game"),
+                game_versions,
+                versions_game,
+                lambda version: fetch_game_version(plugin, client, version, mappings),
+                fetched_game,
+            )
+
+        logger.info("Fetching libraries")
+        needed = {}
+        for version in (*fetched_loader.values(), *fetched_game.values()):
+            for library in version["libraries"]:
+                needed.setdefault(library["name"], library["url"])
+        with span(f"{plugin.NAME} libraries"):
+            prefetch_libraries(client, logger, needed, libraries, checkpoint)
+
+    except KeyboardInterrupt:
+        logger.warning("Cancelled fetching, writing and exiting")
+
+    # Libraries that failed to download are locked without a hash
+    locked = lambda version: all(
+        libraries.get(library["name"], {}).get("sha256")
+        for library in version["libraries"]
+    )
+    for version, info in fetched_loader.items():
+        if locked(info):
+            versions_loader[version] = gen_loader_locks(info)
+    for version, info in fetched_game.items():
+        if locked(info):
+            versions_game[version] = gen_game_locks(info)
+
+
+def update(plugin, client=None, libraries=None, save_libraries=None):
+    """
+    Update the lockfiles next to the plugin, returning counts of what was added.
+    If `libraries` is given, new libraries are added to it instead of being
+    read from and written to libraries.json, and `save_libraries` is called
+    whenever they need to be saved.
+
+    Progress is checkpointed periodically, and the locks are written even if
+    the update fails. Libraries are always saved before the version locks
+    referencing them. Rerunning an interrupted update resumes it, as locked
+    versions and libraries are skipped.
+    """
+    folder = Path(plugin.__file__).parent
+    llo = folder / "loader_locks.json"
+    glo = folder / "game_locks.json"
+
+    versions_loader = read_lock(llo)
+    versions_game = read_lock(glo)
+    if libraries is None:
+        libraries = read_libraries()
+        save_libraries = lambda: write_libraries(libraries)
+    locked = (len(versions_loader), len(versions_game), len(libraries))
+
+    def save():
+        save_libraries()
+        write_lock(llo, versions_loader)
+        write_lock(glo, versions_game)
+
+    checkpoint = Checkpoint(save)
+    try:
+        main(
+            plugin,
+            client or make_client(PREFETCH_JOBS),
+            versions_loader,
+            versions_game,
+            libraries,
+            checkpoint,
+        )
+    finally:
+        checkpoint(force=True)
+
+    return {
+        "loader versions": len(versions_loader) - locked[0],
+        "game versions": len(versions_game) - locked[1],
+        "libraries": len(libraries) - locked[2],
+    }
+
+
+def run(plugin):
+    interrupt_on_sigterm()
+
+    parser = argparse.ArgumentParser()
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    with instrument(args):
+        update(plugin)
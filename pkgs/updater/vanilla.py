@@ -0,0 +1,160 @@
+"""
+Update logic for the vanilla servers, from Mojang's version manifest.
+
+The `update.py` plugin module passed to `run` declares:
+
+- `MANIFEST`: the URL of the v2 version manifest
+- `BLACKLIST`: versions that don't have a server to package
+
+Each version in the manifest comes with the sha1 of its version JSON, which is
+locked as `manifestSha1` so that only new or changed versions are refetched.
+"""
+
+import argparse
+from pathlib import Path
+from typing import Union, Dict
+
+from .client import make_client
+from .fetch import fetch_all
+from .locks import Checkpoint, interrupt_on_sigterm, read_lock, write_lock
+from .metrics import add_arguments, count, instrument, span
+
+# Maximum number of version JSONs to fetch at once
+FETCH_JOBS = 16
+
+
+def parse_manifest(plugin, client) -> Dict[str, Dict[str, str]]:
+    """
+    Fetches the version manifest from Mojang and processes it
+    Returns its output as a dict of {id: {"url", "sha1", "releaseTime"}}
+    """
+
+    print("Fetching manifest")
+    response = client.get(plugin.MANIFEST)
+    response.raise_for_status()
+
+    return dict(
+        map(
+            lambda elem: (
+                elem["id"],
+                {key: elem[key] for key in ("url", "sha1", "releaseTime")},
+            ),
+            filter(
+                lambda elem: elem["type"] in ("release", "snapshot"),
+                response.json()["versions"],
+            ),
+        )
+    )
+
+
+def parse_version(url, sha1, client) -> Union[Dict[str, Union[str, int]], None]:
+    """
+    Fetches the version JSON at the URl, whose sha1 is given by the manifest,
+    and processes it
+    Returns a dict in the form:
+    {
+        "url": string,
+        "sha1": string,
+        "version": string,
+        "javaVersion": int,
+        "manifestUrl": string,
+        "manifestSha1": string
+    }
+    """
+
+    print(f"Fetching {url}")
+    response = client.get(url)
+    response.raise_for_status()
+
+    data = response.json()
+    if "server" in data["downloads"]:
+        return {
+            "url": data["downloads"]["server"]["url"],
+            "sha1": data["downloads"]["server"]["sha1"],
+            "version": data["id"],
+            "javaVersion": data.get("javaVersion", {"majorVersion": 8})["majorVersion"],
+            "manifestUrl": url,
+            "manifestSha1": sha1,
+        }
+
+
+def main(plugin, versions, client, checkpoint, since=None):
+    """
+    Takes in a dict of the existing version lock, a client and a checkpoint
+    Fetches the version manifest and fetches any missing/changed versions,
+    up to FETCH_JOBS at a time, skipping versions released before `since`
+    Updates the version lock in place, calling checkpoint after each version
+    """
+
+    with span(f"{plugin.NAME} manifest"):
+        manifest = parse_manifest(plugin, client)
+
+    # Fetch if version isn't locked or if its version JSON changed
+    stale = [
+        (version, entry)
+        for version, entry in manifest.items()
+        if version not in plugin.BLACKLIST
+        and (since is None or entry["releaseTime"] >= since)
+        and (
+            not (v := versions.get(version, None))
+            or v.get("manifestSha1", None) != entry["sha1"]
+        )
+    ]
+    print(f"Refetching {len(stale)} of {len(manifest)} versions")
+    count(f"{plugin.NAME} versions skipped", len(manifest) - len(stale))
+
+    try:
+        with span(f"{plugin.NAME} version JSONs"):
+            # Results are consumed in manifest order, keeping versions.json
+            # stable
+            results = fetch_all(
+                lambda item: parse_version(item[1]["url"], item[1]["sha1"], client),
+                stale,
+                FETCH_JOBS,
+            )
+            for (version, _), parsed in zip(stale, results):
+                if parsed is not None:
+                    versions[version] = parsed
+                    checkpoint()
+                else:
+                    print(f"{version} has no server, add to blacklist")
+    except KeyboardInterrupt:
+        print("Cancelled fetching. Writing and exiting")
+
+
+def update(plugin, client=None, since=None):
+    """
+    Update versions.json next to the plugin, returning counts of what was added.
+    Only versions released on or after `since`, an ISO 8601 date, are checked
+    for changes if it is given.
+    """
+    lock_path = Path(plugin.__file__).parent / "versions.json"
+    versions = read_lock(lock_path)
+    locked = len(versions)
+
+    # Locked versions are skipped, so rerunning an interrupted update resumes it
+    checkpoint = Checkpoint(lambda: write_lock(lock_path, versions))
+    try:
+        main(
+            plugin, versions, client or make_client(FETCH_JOBS), checkpoint, since
+        )
+    finally:
+        checkpoint(force=True)
+
+    return {"versions": len(versions) - locked}
+
+
+def run(plugin):
+    interrupt_on_sigterm()
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--since",
+        metavar="DATE",
+        help="only check versions released on or after DATE, e.g. 2024-01-01",
+    )
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    with instrument(args):
+        update(plugin, since=args.since)
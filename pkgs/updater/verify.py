@@ -0,0 +1,138 @@
+"""
+Re-verification of locked hashes against what upstream currently serves.
+
+Each locked file is an artifact tuple of `(name, url, algorithm, hash)`, with
+`hash` encoded like its lock does. Verified artifacts are recorded in a local
+cache along with the ETag and size they were served with. Later runs only send
+a HEAD request for those, and download them again if either changed, if their
+locked hash changed, or if they are picked for a spot check.
+"""
+
+import math
+import random
+from pathlib import Path
+
+import requests
+
+from .cache import CACHE_DIR
+from .client import make_client
+from .fetch import fetch_all
+from .hashing import TIMEOUT, hash_url, nix_base32
+from .libraries import locked_url, read_libraries
+from .locks import Checkpoint, read_lock, read_shards, write_lock
+from .papermc import build_url
+
+# Kept with the HTTP cache, which only ever evicts its own `.body` files
+VERIFIED = CACHE_DIR / "verified.json"
+
+# Maximum number of artifacts to check at once
+VERIFY_JOBS = 16
+
+
+def library_artifacts():
+    for name, entry in read_libraries().items():
+        # Libraries that failed to prefetch have no hash to check yet
+        if entry["sha256"]:
+            yield name, locked_url(name, entry), "sha256", entry["sha256"]
+
+
+def papermc_artifacts(plugin):
+    shards = read_shards(Path(plugin.__file__).parent / "locks")
+    for version, builds in shards.items():
+        for build, entry in builds.items():
+            name = f"{plugin.NAME} {version} build {build}"
+            url = build_url(plugin, version, build, entry)
+            yield name, url, "sha256", entry["sha256"]
+
+
+def vanilla_artifacts(plugin):
+    versions = read_lock(Path(plugin.__file__).parent / "versions.json")
+    for version, entry in versions.items():
+        yield f"{plugin.NAME} {version}", entry["url"], "sha1", entry["sha1"]
+
+
+def encode(digest, expected):
+    """
+    Encode a digest like the locked hash `expected`, as hex or Nix's base32
+    """
+    return digest.hex() if len(expected) == len(digest) * 2 else nix_base32(digest)
+
+
+def validators(headers):
+    return {"etag": headers.get("ETag"), "size": headers.get("Content-Length")}
+
+
+def unchanged(client, url, record):
+    """
+    Returns whether upstream still serves `url` with the ETag and size it had
+    when it was verified
+    """
+    if record["etag"] is None and record["size"] is None:
+        return False
+    try:
+        response = client.head(url, allow_redirects=True, timeout=TIMEOUT)
+        response.raise_for_status()
+    except requests.RequestException:
+        return False
+    return validators(response.headers) == {
+        key: record[key] for key in ("etag", "size")
+    }
+
+
+def check(client, artifact, record, sample):
+    """
+    Check an artifact against upstream, returning its status and either its
+    new record in the verified cache or a description of the problem
+    """
+    _, url, algorithm, expected = artifact
+    if record is not None and record["hash"] == expected and not sample:
+        if unchanged(client, url, record):
+            return "unchanged", record
+
+    try:
+        digest, headers = hash_url(client, url, algorithm)
+    except requests.RequestException as e:
+        return "failed", str(e)
+
+    actual = encode(digest, expected)
+    if actual != expected:
+        return "mismatched", f"expected {expected}, got {actual}"
+    return "verified", {"hash": expected, **validators(headers)}
+
+
+def verify(artifacts, client=None, sample=0, jobs=VERIFY_JOBS):
+    """
+    Check each of `artifacts` against upstream, downloading new or changed ones
+    and `sample` percent of the rest, and return the number of artifacts with
+    each status. Verified artifacts are recorded in VERIFIED as they complete.
+    """
+    client = client or make_client(jobs)
+    cache = read_lock(VERIFIED)
+    artifacts = list(artifacts)
+
+    cached = [a for a in artifacts if cache.get(a[1], {}).get("hash") == a[3]]
+    sampled = set(random.sample(cached, math.ceil(len(cached) * sample / 100)))
+    print(
+        f"Checking {len(artifacts)} artifacts, {len(artifacts) - len(cached)}"
+        f" new or changed and {len(sampled)} sampled"
+    )
+
+    VERIFIED.parent.mkdir(parents=True, exist_ok=True)
+    checkpoint = Checkpoint(lambda: write_lock(VERIFIED, cache))
+    counts = dict.fromkeys(("verified", "unchanged", "mismatched", "failed"), 0)
+    try:
+        results = fetch_all(
+            lambda a: check(client, a, cache.get(a[1]), a in sampled), artifacts, jobs
+        )
+        for (name, url, _, _), (status, result) in zip(artifacts, results):
+            counts[status] += 1
+            if status in ("verified", "unchanged"):
+                cache[url] = result
+                checkpoint()
+            else:
+                cache.pop(url, None)
+                print(f"{name} {status}: {result}")
+    finally:
+        checkpoint(force=True)
+
+    return counts
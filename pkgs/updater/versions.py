@@ -0,0 +1,46 @@
+"""
+Version comparison matching Nix's `builtins.compareVersions`, so that the
+update scripts can precompute what the Nix expressions would otherwise sort.
+"""
+
+import re
+from functools import cmp_to_key
+
+COMPONENT = re.compile(r"[0-9]+|[^0-9.\-]+")
+
+
+def _older_component(c1, c2):
+    n1, n2 = c1.isdigit(), c2.isdigit()
+    if n1 and n2:
+        return int(c1) < int(c2)
+    if c1 == "" and n2:
+        return True
+    if c1 == "pre" and c2 != "pre":
+        return True
+    if c2 == "pre":
+        return False
+    # Assume that `2.3a' < `2.3.1'
+    if n2:
+        return True
+    if n1:
+        return False
+    return c1 < c2
+
+
+def compare_versions(v1, v2):
+    """
+    Returns -1, 0 or 1 if `v1` is older than, equal to or newer than `v2`
+    """
+    components1 = COMPONENT.findall(v1)
+    components2 = COMPONENT.findall(v2)
+    for i in range(max(len(components1), len(components2))):
+        c1 = components1[i] if i < len(components1) else ""
+        c2 = components2[i] if i < len(components2) else ""
+        if _older_component(c1, c2):
+            return -1
+        if _older_component(c2, c1):
+            return 1
+    return 0
+
+
+version_key = cmp_to_key(compare_versions)
@@ -3,39 +3,50 @@
   lib,
 }:
 let
-  inherit (builtins) listToAttrs sort filter;
+  inherit (builtins) listToAttrs;
   inherit (lib)
     nameValuePair
-    last
     recurseIntoAttrs
-    flatten
+    concatLists
+    genAttrs
+    mapAttrs
     mapAttrsToList
-    versionOlder
     importJSON
     ;
   inherit (lib.our) escapeVersion;
-  versions = importJSON ./lock.json;
 
-  # Sort by attribute 'attr' using 'f' function
-  sortBy = attr: f: sort (a: b: f a.${attr} b.${attr});
+  endpoint = "https://api.papermc.io/v2/projects/velocity";
 
-  packages = mapAttrsToList (
-    version: builds:
-    sortBy "version" versionOlder (
-      mapAttrsToList (
-        buildNumber: value:
-        callPackage ./derivation.nix {
-          inherit (value) url sha256 channel;
-          version = "${version}-build.${buildNumber}";
-        }
-      ) builds
-    )
-  ) versions;
-  stablePackages = filter (x: x != [ ]) (map (filter (x: x.meta.branch != "experimental")) packages);
+  # Every version's build numbers and the latest stable build, precomputed by
+  # update.py. The per-build data in each version's lock is only read when needed.
+  index = importJSON ./locks/index.json;
+  locks = mapAttrs (version: _: importJSON (./locks + "/${version}.json")) index.versions;
+
+  mkPackage =
+    version: buildNumber:
+    let
+      build = locks.${version}.${buildNumber};
+      name = build.name or "velocity-${version}-${buildNumber}.jar";
+    in
+    callPackage ./derivation.nix {
+      url = "${endpoint}/versions/${version}/builds/${buildNumber}/downloads/${name}";
+      inherit (build) sha256;
+      channel = build.channel or "default";
+      version = "${version}-build.${buildNumber}";
+    };
+
+  packages = mapAttrs (version: v: genAttrs v.builds (mkPackage version)) index.versions;
 in
 recurseIntoAttrs (
   listToAttrs (
-    (map (x: nameValuePair (escapeVersion x.name) x) (flatten packages))
-    ++ [ (nameValuePair "velocity" (last (last stablePackages))) ]
+    concatLists (
+      mapAttrsToList (
+        version: builds:
+        mapAttrsToList (
+          buildNumber: nameValuePair (escapeVersion "velocity-${version}-build.${buildNumber}")
+        ) builds
+      ) packages
+    )
+    ++ [ (nameValuePair "velocity" packages.${index.latest.version}.${index.latest.build}) ]
   )
 )
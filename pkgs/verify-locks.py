@@ -0,0 +1,73 @@
+#!/usr/bin/env nix-shell
+#!nix-shell -i python3 -p python3Packages.requests
+
+"""
+Checks that the hashes in the locks still match what upstream serves, without
+building anything. Files verified by an earlier run are only downloaded again
+if upstream's ETag or size for them changed, or if they are sampled.
+"""
+
+import argparse
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+from updater import load_plugin
+from updater.locks import interrupt_on_sigterm
+from updater.verify import (
+    VERIFY_JOBS,
+    library_artifacts,
+    papermc_artifacts,
+    vanilla_artifacts,
+    verify,
+)
+
+# Each lock that can be checked, and how to list the artifacts it locks
+LOCKS = {
+    "libraries": library_artifacts,
+    "vanilla": lambda: vanilla_artifacts(load_plugin("vanilla", "vanilla-servers")),
+    "paper": lambda: papermc_artifacts(load_plugin("paper", "paper-servers")),
+    "velocity": lambda: papermc_artifacts(load_plugin("velocity", "velocity-servers")),
+}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "locks",
+        nargs="*",
+        metavar="LOCK",
+        help=f"locks to check (default: all of {', '.join(LOCKS)})",
+    )
+    parser.add_argument(
+        "--sample",
+        type=float,
+        default=0,
+        metavar="PERCENT",
+        help="also download this percentage of already verified files again",
+    )
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=VERIFY_JOBS,
+        help="maximum number of files to check at once",
+    )
+    args = parser.parse_args()
+
+    for name in args.locks:
+        if name not in LOCKS:
+            parser.error(f"unknown lock: {name}")
+
+    interrupt_on_sigterm()
+    artifacts = [
+        artifact
+        for name, list_artifacts in LOCKS.items()
+        if not args.locks or name in args.locks
+        for artifact in list_artifacts()
+    ]
+    counts = verify(artifacts, sample=args.sample, jobs=args.jobs)
+
+    print("\nSummary:")
+    for status, count in counts.items():
+        print(f"  {count} {status}")
+    sys.exit(1 if counts["mismatched"] or counts["failed"] else 0)
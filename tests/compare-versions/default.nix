@@ -0,0 +1,71 @@
+{
+  lib,
+  python3,
+  stdenvNoCC,
+}:
+let
+  # Versions and what `builtins.compareVersions` returns for them, which the
+  # update scripts' port in pkgs/updater/versions.py must return as well
+  cases = [
+    [ "1.0" "1.0" 0 ]
+    [ "1.0" "1.0.1" (-1) ]
+    [ "1.10" "1.9" 1 ]
+    [ "10" "9" 1 ]
+    [ "010" "10" 0 ]
+    [ "1.0" "1-0" 0 ]
+    [ "1.0" "1.0." 0 ]
+    # Alphabetic parts are older than numeric ones
+    [ "2.3a" "2.3.1" (-1) ]
+    [ "1.2.a3" "1.2.3" (-1) ]
+    [ "a" "1" (-1) ]
+    [ "24w14a" "1.20.5" 1 ]
+    [ "0.16.2+mc1.21.5" "0.16.2+mc1.21.4" 1 ]
+    [ "1.0alpha" "1.0beta" (-1) ]
+    # Suffixes other than "pre" are newer than no suffix at all
+    [ "1.0-rc1" "1.0" 1 ]
+    [ "1.20.5" "1.20.5-1" (-1) ]
+    # "pre" is older than anything else
+    [ "1.0pre1" "1.0" (-1) ]
+    [ "pre" "" (-1) ]
+    [ "1.0pre" "1.0alpha" (-1) ]
+    [ "1.21.5-pre3" "1.21.5-rc1" (-1) ]
+    [ "1.0.0-pre1" "1.0.0-pre2" (-1) ]
+  ];
+
+  wrong = lib.filter (
+    case: builtins.compareVersions (lib.elemAt case 0) (lib.elemAt case 1) != lib.elemAt case 2
+  ) cases;
+in
+assert lib.assertMsg (wrong == [ ]) "compareVersions disagrees with ${builtins.toJSON wrong}";
+stdenvNoCC.mkDerivation {
+  name = "compare-versions-check";
+  doCheck = true;
+  phases = [
+    "checkPhase"
+    "installPhase"
+  ];
+  nativeBuildInputs = [ python3 ];
+  cases = builtins.toJSON cases;
+  passAsFile = [ "cases" ];
+  checkPhase = ''
+    python3 - "$casesPath" <<'PYTHON'
+    import importlib.util, json, sys
+
+    spec = importlib.util.spec_from_file_location(
+        "versions", "${../../pkgs/updater/versions.py}"
+    )
+    versions = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(versions)
+
+    failed = False
+    for v1, v2, expected in json.load(open(sys.argv[1])):
+        for a, b, result in ((v1, v2, expected), (v2, v1, -expected)):
+            actual = versions.compare_versions(a, b)
+            if actual != result:
+                print(f"compare_versions({a!r}, {b!r}) = {actual}, expected {result}")
+                failed = True
+    sys.exit(failed)
+    PYTHON
+  '';
+  installPhase = "mkdir $out";
+}
@@ -0,0 +1,24 @@
+{
+  fetchPackwizModpack,
+  stdenvNoCC,
+}:
+let
+  pack = fetchPackwizModpack {
+    src = ../packwiz-from-src/sample-pack;
+    lock = ./lock.json;
+  };
+in
+stdenvNoCC.mkDerivation {
+  name = "packwiz-from-lock-check";
+  doCheck = true;
+  phases = [
+    "checkPhase"
+    "installPhase"
+  ];
+  checkPhase = ''
+    set -euo pipefail
+    test -f ${pack}/pack.toml
+    test -f '${pack}/mods/lithium-fabric-0.16.2+mc1.21.5.jar'
+  '';
+  installPhase = "mkdir $out";
+}
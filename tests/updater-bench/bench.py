@@ -0,0 +1,304 @@
+#!/usr/bin/env nix-shell
+#!nix-shell -i python3 -p python3Packages.requests python3Packages.jq
+
+"""
+Benchmarks the update scripts offline, against the stand-in upstream from
+`upstream.py`. Each updater runs in its own process on a copy of `pkgs/`, in
+these scenarios:
+
+- cold: without locks or an HTTP cache, locking everything from scratch
+- incremental: with the checked-in locks missing their newest entries
+- warm: right after the incremental run, with nothing new and the HTTP cache
+  filled
+
+Each run reports its wall time, the requests and body bytes the stand-in
+served, and the updater's peak RSS.
+"""
+
+import argparse
+import importlib.util
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from upstream import PKGS, Upstream, rewrite
+
+SCENARIOS = ["cold", "incremental", "warm"]
+
+# Newest entries removed from each lock before an incremental run
+DROP_NEWEST = 5
+
+
+def load_module(name, path):
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def load_ecosystems(pkgs):
+    """
+    Returns update-all.py's ECOSYSTEMS from `pkgs`, importing the updater
+    package from there too
+    """
+    sys.path.insert(0, str(pkgs))
+    return load_module("update_all", pkgs / "update-all.py").ECOSYSTEMS
+
+
+def engine_name(engine):
+    return engine.__name__.rpartition(".")[2]
+
+
+def point_at(plugin, base):
+    """
+    Rewrite the upstream URLs declared by a plugin to the stand-in's
+    """
+    url = lambda value: (
+        rewrite(value, base)
+        if isinstance(value, str) and value.startswith("https://")
+        else value
+    )
+    for key, value in vars(plugin).items():
+        if key.isupper():
+            if isinstance(value, dict):
+                value = {k: url(v) for k, v in value.items()}
+            setattr(plugin, key, url(value))
+
+
+def lock_paths(pkgs, folder, engine):
+    if engine == "textile":
+        return [
+            pkgs / folder / "loader_locks.json",
+            pkgs / folder / "game_locks.json",
+            pkgs / "build-support" / "libraries.json",
+        ]
+    if engine == "papermc":
+        return [pkgs / folder / "locks"]
+    return [pkgs / folder / "versions.json"]
+
+
+def drop_newest(pkgs, folder, engine, count):
+    """
+    Remove the newest `count` entries from the locks of an updater
+    """
+    from updater.locks import read_lock, write_lock
+    from updater.versions import version_key
+
+    def drop(path, newest):
+        lock = read_lock(path)
+        for key in newest(lock)[:count]:
+            del lock[key]
+        write_lock(path, lock)
+
+    if engine == "vanilla":
+        # versions.json is ordered newest first
+        drop(pkgs / folder / "versions.json", list)
+    elif engine == "textile":
+        newest = lambda lock: sorted(lock, key=version_key, reverse=True)
+        drop(pkgs / folder / "loader_locks.json", newest)
+        drop(pkgs / folder / "game_locks.json", newest)
+    elif engine == "papermc":
+        versions = read_lock(pkgs / folder / "locks" / "index.json")["versions"]
+        latest = max(versions, key=version_key)
+        newest = lambda lock: sorted(lock, key=int, reverse=True)
+        drop(pkgs / folder / "locks" / f"{latest}.json", newest)
+
+
+def reset_locks(pkgs, folder, engine, incremental, drop):
+    """
+    Remove the locks of an updater, or with `incremental`, restore the
+    checked-in locks without their `drop` newest entries
+    """
+    for path in lock_paths(pkgs, folder, engine):
+        if path.is_dir():
+            shutil.rmtree(path)
+        else:
+            path.unlink(missing_ok=True)
+        if incremental:
+            source = PKGS / path.relative_to(pkgs)
+            (shutil.copytree if source.is_dir() else shutil.copy)(source, path)
+    if incremental:
+        drop_newest(pkgs, folder, engine, drop)
+
+
+def run(name, pkgs, cache, upstream, log):
+    """
+    Run one updater in a child process, returning its measurements
+    """
+    env = dict(os.environ, NIX_MINECRAFT_CACHE_DIR=str(cache))
+    command = [sys.executable, __file__, "--child", name, str(pkgs), upstream.base]
+
+    upstream.reset()
+    start = time.monotonic()
+    with open(log, "a") as output:
+        process = subprocess.Popen(
+            command, env=env, stdout=output, stderr=subprocess.STDOUT
+        )
+        _, status, usage = os.wait4(process.pid, 0)
+        process.returncode = os.waitstatus_to_exitcode(status)
+    seconds = time.monotonic() - start
+
+    return {
+        "ok": process.returncode == 0,
+        "seconds": seconds,
+        **upstream.reset(),
+        # ru_maxrss is in KiB on Linux
+        "peak_rss": usage.ru_maxrss * 1024,
+    }
+
+
+def bench(names, scenarios, upstream, workdir, drop=DROP_NEWEST):
+    """
+    Run each updater in `names` through `scenarios`, returning a list of
+    measurements
+    """
+    ecosystems = load_ecosystems(PKGS)
+    results = []
+    for name in names:
+        folder, engine = ecosystems[name]
+        engine = engine_name(engine)
+        pkgs = workdir / name / "pkgs"
+        shutil.copytree(
+            PKGS, pkgs, ignore=shutil.ignore_patterns("__pycache__", "*.progress")
+        )
+        log = workdir / name / "log"
+
+        for scenario in scenarios:
+            if scenario != "warm":
+                cache = Path(tempfile.mkdtemp(dir=workdir / name))
+                reset_locks(pkgs, folder, engine, scenario == "incremental", drop)
+
+            print(f"Running {name} ({scenario})", file=sys.stderr)
+            result = run(name, pkgs, cache, upstream, log)
+            results.append({"updater": name, "scenario": scenario, **result})
+            if not result["ok"]:
+                output = log.read_text().splitlines()[-20:]
+                print(f"{name} failed:", *output, sep="\n", file=sys.stderr)
+
+    return results
+
+
+def size(count):
+    for unit in ("B", "KiB", "MiB"):
+        if count < 1024:
+            return f"{count:.0f} {unit}"
+        count /= 1024
+    return f"{count:.1f} GiB"
+
+
+def report(results):
+    print(
+        f"{'updater':<15}{'scenario':<13}{'wall':>9}{'requests':>10}"
+        f"{'bytes':>12}{'peak RSS':>12}"
+    )
+    for r in results:
+        wall = f"{r['seconds']:.2f}s" if r["ok"] else "failed"
+        print(
+            f"{r['updater']:<15}{r['scenario']:<13}{wall:>9}{r['requests']:>10}"
+            f"{size(r['bytes']):>12}{size(r['peak_rss']):>12}"
+        )
+
+
+def child(name, pkgs, base):
+    """
+    Run an updater on the copy of `pkgs/` at `pkgs`, against the stand-in
+    """
+    folder, engine = load_ecosystems(pkgs)[name]
+    from updater import load_plugin
+
+    plugin = load_plugin(name, folder)
+    point_at(plugin, base)
+    engine.update(plugin)
+
+
+if __name__ == "__main__":
+    if sys.argv[1:2] == ["--child"]:
+        child(sys.argv[2], Path(sys.argv[3]), sys.argv[4])
+        sys.exit()
+
+    ecosystems = load_ecosystems(PKGS)
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "updaters",
+        nargs="*",
+        metavar="UPDATER",
+        help=f"updaters to benchmark (default: all of {', '.join(ecosystems)})",
+    )
+    parser.add_argument(
+        "--scenario",
+        action="append",
+        choices=SCENARIOS,
+        help="scenarios to run, in order (default: all)",
+    )
+    parser.add_argument(
+        "--latency",
+        type=float,
+        default=0,
+        metavar="MS",
+        help="delay before the stand-in answers each request",
+    )
+    parser.add_argument(
+        "--error-rate",
+        type=float,
+        default=0,
+        metavar="FRACTION",
+        help="fraction of requests answered with a 503",
+    )
+    parser.add_argument(
+        "--throttle-rate",
+        type=float,
+        default=0,
+        metavar="FRACTION",
+        help="fraction of requests answered with a 429",
+    )
+    parser.add_argument(
+        "--drop",
+        type=int,
+        default=DROP_NEWEST,
+        metavar="N",
+        help="newest entries to remove from each lock before an incremental run",
+    )
+    parser.add_argument(
+        "--json",
+        metavar="FILE",
+        help="also write the measurements to FILE",
+    )
+    args = parser.parse_args()
+
+    for name in args.updaters:
+        if name not in ecosystems:
+            parser.error(f"unknown updater: {name}")
+    scenarios = args.scenario or SCENARIOS
+    if "warm" in scenarios and scenarios[0] == "warm":
+        parser.error("the warm scenario must follow another one")
+
+    from updater import load_plugin
+
+    upstream = Upstream(
+        [
+            (engine_name(engine), load_plugin(name, folder))
+            for name, (folder, engine) in ecosystems.items()
+        ],
+        args.latency / 1000,
+        args.error_rate,
+        args.throttle_rate,
+    ).start()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        results = bench(
+            args.updaters or list(ecosystems),
+            scenarios,
+            upstream,
+            Path(workdir),
+            args.drop,
+        )
+        report(results)
+        if args.json:
+            Path(args.json).write_text(json.dumps(results, indent=2) + "\n")
+
+    sys.exit(0 if all(r["ok"] for r in results) else 1)
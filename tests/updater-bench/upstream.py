@@ -0,0 +1,273 @@
+"""
+Local stand-in for every upstream the update scripts talk to, seeded from the
+checked-in locks.
+
+Every upstream URL `https://<host>/<path>` maps to `<base>/<host>/<path>`, so
+pointing an update script at the stand-in is a matter of rewriting the URLs in
+its plugin module with `rewrite`. The stand-in serves:
+
+- Mojang's v2 version manifest and version JSONs, from vanilla-servers
+- the Fabric, Quilt and Legacy Fabric meta APIs, from their loader and game
+  locks and libraries.json
+- the PaperMC v2 API for Paper and Velocity, including version groups, from
+  their sharded locks
+- any Maven repository, with generated jars of a fixed size
+
+Responses carry an ETag and honour If-None-Match, and the stand-in can add
+latency, server errors and 429s to any request.
+"""
+
+import hashlib
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import unquote, urlsplit
+
+PKGS = Path(__file__).resolve().parent.parent.parent / "pkgs"
+
+# Size of each generated Maven artifact, in bytes
+ARTIFACT_SIZE = 64 * 1024
+
+# Seconds clients are asked to wait after a 429
+RETRY_AFTER = 1
+
+
+def rewrite(url, base):
+    """
+    Returns the stand-in's URL for an upstream URL
+    """
+    parts = urlsplit(url)
+    return f"{base}/{parts.hostname}{parts.path}"
+
+
+def read(path):
+    return json.loads(path.read_text()) if path.exists() else {}
+
+
+def seed_vanilla(routes, base, folder, manifest_url):
+    versions = read(PKGS / folder / "versions.json")
+    manifest = []
+    for i, (version, entry) in enumerate(versions.items()):
+        sha1 = entry.get("manifestSha1", hashlib.sha1(version.encode()).hexdigest())
+        path = f"/piston-meta.mojang.com/v1/packages/{sha1}/{version}.json"
+        manifest.append(
+            {
+                "id": version,
+                "type": "release",
+                "url": base + path,
+                "sha1": sha1,
+                # versions.json is ordered newest first
+                "releaseTime": time.strftime(
+                    "%Y-%m-%dT%H:%M:%S+00:00", time.gmtime(1.7e9 - i * 86400)
+                ),
+            }
+        )
+        routes[path] = {
+            "id": version,
+            "downloads": {"server": {"url": entry["url"], "sha1": entry["sha1"]}},
+            "javaVersion": {"majorVersion": entry["javaVersion"]},
+        }
+    routes[urlsplit(rewrite(manifest_url, base)).path] = {"versions": manifest}
+
+
+def seed_textile(routes, base, folder, endpoint, loader_game_version):
+    """
+    Serve a textile meta API at `endpoint` from the locks in `folder`
+    """
+    prefix = urlsplit(rewrite(endpoint, base)).path
+    libraries = read(PKGS / "build-support" / "libraries.json")
+    repositories = libraries.get("repositories", {})
+    repo = lambda name: rewrite(
+        repositories[libraries["libraries"][name]["repo"]], base
+    )
+
+    loaders = read(PKGS / folder / "loader_locks.json")
+    routes[f"{prefix}/loader"] = [
+        {
+            "separator": ".",
+            "build": i,
+            "maven": lock["libraries"][-1],
+            "version": version,
+            "stable": True,
+        }
+        for i, (version, lock) in enumerate(loaders.items())
+    ]
+    for version, lock in loaders.items():
+        *common, loader = lock["libraries"]
+        routes[f"{prefix}/loader/{loader_game_version}/{version}"] = {
+            "loader": {"maven": loader},
+            "launcherMeta": {
+                "mainClass": {"server": lock["mainClass"]},
+                "libraries": {
+                    "common": [{"name": name, "url": repo(name)} for name in common],
+                    "server": [],
+                },
+            },
+        }
+
+    games = read(PKGS / folder / "game_locks.json")
+    routes[f"{prefix}/game"] = [
+        {"version": version, "stable": True} for version in games
+    ]
+    for version, lock in games.items():
+        for name in lock["libraries"]:
+            mapping = name.split(":")[1]
+            entry = {"maven": name, "version": version, "stable": True}
+            routes.setdefault(f"{prefix}/{mapping}", []).append(entry)
+            routes[f"{prefix}/{mapping}/{version}"] = [entry]
+
+
+def seed_papermc(routes, base, folder, endpoint, project):
+    """
+    Serve a PaperMC project at `endpoint` from its lock, with versions grouped
+    by their recorded group or their first two components
+    """
+    prefix = urlsplit(rewrite(endpoint, base)).path
+    index = read(PKGS / folder / "locks" / "index.json")
+    groups = {}
+    for version, info in index["versions"].items():
+        group = info.get("group", ".".join(version.split(".")[:2]))
+        groups.setdefault(group, []).append(version)
+    routes[prefix] = {
+        "project_id": project,
+        "version_groups": list(groups),
+        "versions": list(index["versions"]),
+    }
+
+    for version, info in index["versions"].items():
+        shard = read(PKGS / folder / "locks" / f"{version}.json")
+        routes[f"{prefix}/versions/{version}/builds"] = {
+            "builds": [
+                {
+                    "build": int(build),
+                    "version": version,
+                    "channel": shard[build].get("channel", "default"),
+                    "time": "2024-01-01T00:00:00.000Z",
+                    "downloads": {
+                        "application": {
+                            "name": shard[build].get(
+                                "name", f"{project}-{version}-{build}.jar"
+                            ),
+                            "sha256": shard[build]["sha256"],
+                        }
+                    },
+                }
+                for build in info["builds"]
+            ]
+        }
+
+    for group, versions in groups.items():
+        routes[f"{prefix}/version_group/{group}"] = {"versions": versions}
+        routes[f"{prefix}/version_group/{group}/builds"] = {
+            "versions": versions,
+            "builds": [
+                build
+                for version in versions
+                for build in routes[f"{prefix}/versions/{version}/builds"]["builds"]
+            ],
+        }
+
+
+def seed(base, ecosystems):
+    """
+    Returns the JSON response of every API route the stand-in serves, for
+    `ecosystems`, a list of each one's engine and plugin module
+    """
+    routes = {}
+    for engine, plugin in ecosystems:
+        folder = Path(plugin.__file__).parent.name
+        if engine == "vanilla":
+            seed_vanilla(routes, base, folder, plugin.MANIFEST)
+        elif engine == "textile":
+            seed_textile(
+                routes, base, folder, plugin.ENDPOINT, plugin.LOADER_GAME_VERSION
+            )
+        elif engine == "papermc":
+            seed_papermc(routes, base, folder, plugin.ENDPOINT, plugin.NAME)
+    return {path: json.dumps(body).encode() for path, body in routes.items()}
+
+
+class Upstream(ThreadingHTTPServer):
+    """
+    The stand-in server, counting the requests it answers and the bytes of
+    the bodies it sends
+    """
+
+    daemon_threads = True
+
+    def __init__(self, ecosystems, latency=0, error_rate=0, throttle_rate=0):
+        super().__init__(("127.0.0.1", 0), Handler)
+        self.base = f"http://127.0.0.1:{self.server_port}"
+        self.routes = seed(self.base, ecosystems)
+        self.latency = latency
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """
+        Returns the counts so far and starts counting again
+        """
+        with self.lock:
+            counts = getattr(self, "counts", None)
+            self.counts = {"requests": 0, "bytes": 0}
+        return counts
+
+    def count(self, size):
+        with self.lock:
+            self.counts["requests"] += 1
+            self.counts["bytes"] += size
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+
+class Handler(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+    def respond(self, status, body=b"", headers={}):
+        self.send_response(status)
+        for key, value in headers.items():
+            self.send_header(key, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if self.command != "HEAD":
+            self.wfile.write(body)
+            self.server.count(len(body))
+        else:
+            self.server.count(0)
+
+    def body(self, path):
+        if path in self.server.routes:
+            return self.server.routes[path], "application/json"
+        if path.endswith(".jar") or path.endswith(".zip"):
+            block = hashlib.sha256(path.encode()).digest()
+            return (block * (ARTIFACT_SIZE // len(block) + 1))[:ARTIFACT_SIZE], (
+                "application/java-archive"
+            )
+        return None, None
+
+    def do_GET(self):
+        server = self.server
+        time.sleep(server.latency)
+        if random.random() < server.throttle_rate:
+            return self.respond(429, headers={"Retry-After": str(RETRY_AFTER)})
+        if random.random() < server.error_rate:
+            return self.respond(503)
+
+        body, content_type = self.body(unquote(urlsplit(self.path).path))
+        if body is None:
+            return self.respond(404)
+
+        etag = f'"{hashlib.md5(body).hexdigest()}"'
+        if self.headers.get("If-None-Match") == etag:
+            return self.respond(304, headers={"ETag": etag})
+        self.respond(200, body, {"Content-Type": content_type, "ETag": etag})
+
+    do_HEAD = do_GET